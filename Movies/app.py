@@ -1,103 +1,65 @@
 import streamlit as st
-import pickle
 import pandas as pd
-import requests
 import os
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import difflib
-from collections import Counter
+import sys
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def fetch_poster(movie_id):
-    response = requests.get(
-        "https://api.themoviedb.org/3/movie/{}?api_key=fef9863a13e486ed5f253bad426b92e9&language=en-US".format(
-            movie_id
-        )
-    )
-    data = response.json()
-    return "https://image.tmdb.org/t/p/w500" + data["poster_path"]
+from cinematch.analytics import get_stats
+from cinematch.artifacts import open_model
+from cinematch.catalog import get_catalog
+from cinematch.engines import engine_mode, load_engine
+from cinematch.fuzzy import FuzzyTitleIndex
+from cinematch.recommender import MovieIndex, Recommender
 
 
-def fetch_movie_details(movie_id):
-    response = requests.get(
-        "https://api.themoviedb.org/3/movie/{}?api_key=fef9863a13e486ed5f253bad426b92e9&language=en-US".format(
-            movie_id
-        )
-    )
-    data = response.json()
-    title = data.get("title")
-    overview = data.get("overview") or ""
-    release_date = data.get("release_date") or ""
-    year = release_date.split("-")[0] if release_date else ""
-    rating = data.get("vote_average")
-    poster_path = data.get("poster_path")
-    poster = (
-        "https://image.tmdb.org/t/p/w500" + poster_path
-        if poster_path
-        else fetch_poster(movie_id)
+base_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+@st.cache_resource
+def load_resources():
+    """Model, indexes and recommender, built once per server process."""
+    model = open_model(base_dir, dense=engine_mode() == "dense")
+    movies = pd.DataFrame(
+        {
+            "movie_id": model.movie_ids,
+            "title": model.titles.tolist(),
+            "tags": model.tags.tolist(),
+        }
     )
-    return {
-        "title": title,
-        "overview": overview,
-        "year": year,
-        "rating": rating,
-        "poster": poster,
-    }
+    engine = load_engine(model)
+    movie_index = MovieIndex(movies["movie_id"].values, movies["title"].tolist())
+    recommender = Recommender(movie_index, engine)
+    title_matcher = FuzzyTitleIndex(movie_index.titles)
+    return model, movies, recommender, title_matcher
+
+
+@st.cache_data(show_spinner=False)
+def similar_rows(row, top_n):
+    # Only the model's answer is memoized. Details are attached on every
+    # run from the TMDB cache, so a card that missed the deadline once is
+    # filled in on the next rerun.
+    rows, scores = recommender.similar_rows(row, top_n)
+    return rows.tolist(), scores.tolist()
 
 
 def recommend(movie_title, top_n=6):
-    movie_index = movies[movies["title"] == movie_title].index[0]
-    distances = similarity[movie_index]
-    movies_list = sorted(
-        list(enumerate(distances)), reverse=True, key=lambda x: x[1]
-    )[1 : top_n + 1]
-
-    recommendations = []
-    for idx, score in movies_list:
-        row = movies.iloc[idx]
-        movie_id = int(row.movie_id)
-        details = fetch_movie_details(movie_id)
-        overview = details["overview"]
-        if len(overview) > 180:
-            overview = overview[:180] + "..."
-        recommendations.append(
-            {
-                "movie_id": movie_id,
-                "title": details["title"] or row.title,
-                "year": details["year"],
-                "poster": details["poster"],
-                "rating": details["rating"],
-                "similarity": float(score),
-                "overview": overview,
-            }
-        )
-    return recommendations
+    row = recommender.index.row_for_title(movie_title)
+    return recommender.cards(*similar_rows(row, top_n))
 
 
-base_dir = os.path.dirname(os.path.abspath(__file__))
+def recommend_by_id(movie_id, top_n=6):
+    row = recommender.index.row_for_id(movie_id)
+    return recommender.cards(*similar_rows(row, top_n))
 
-movies_dict_path = os.path.join(base_dir, "movies_dict.pkl")
-movies_pkl_path = os.path.join(base_dir, "movies.pkl")
-similarity_path = os.path.join(base_dir, "similarity.pkl")
 
-if os.path.exists(movies_dict_path):
-    movies_dict = pickle.load(open(movies_dict_path, "rb"))
-elif os.path.exists(movies_pkl_path):
-    movies_dict = pickle.load(open(movies_pkl_path, "rb"))
-else:
-    raise FileNotFoundError("movies_dict.pkl or movies.pkl not found in Movies directory")
+@st.cache_data(show_spinner=False)
+def load_stats(model_version, catalog_version):
+    # The versions are the cache key; get_stats recomputes when they change.
+    return get_stats(model, get_catalog())
 
-movies = pd.DataFrame(movies_dict)
 
-if os.path.exists(similarity_path):
-    similarity = pickle.load(open(similarity_path, "rb"))
-else:
-    cv = CountVectorizer(max_features=5000, stop_words="english")
-    vectors = cv.fit_transform(movies["tags"]).toarray()
-    similarity = cosine_similarity(vectors)
-    with open(similarity_path, "wb") as f:
-        pickle.dump(similarity, f)
+model, movies, recommender, title_matcher = load_resources()
 
 st.set_page_config(page_title="Movie Recommender", layout="wide")
 
@@ -111,18 +73,11 @@ if page == "Home":
     search_query = st.text_input("Quick search", "")
     top_n_home = st.slider("Number of results", 3, 10, 6, key="home_top_n")
     titles = movies["title"].values
-    selected_title = None
     if st.button("Search", key="home_search") and search_query:
-        titles_lower = [t.lower() for t in titles]
-        matches = difflib.get_close_matches(
-            search_query.lower(), titles_lower, n=1, cutoff=0.3
-        )
-        if matches:
-            match = matches[0]
-            idx = titles_lower.index(match)
-            selected_title = titles[idx]
-    if not selected_title:
-        selected_title = titles[0]
+        idx = title_matcher.best(search_query)
+        if idx is not None:
+            st.session_state["home_title"] = titles[idx]
+    selected_title = st.session_state.get("home_title", titles[0])
     recs = recommend(selected_title, top_n=top_n_home)
     st.subheader("Trending and similar titles")
     cols = st.columns(4)
@@ -157,14 +112,14 @@ elif page == "Recommendations":
         if random_clicked:
             movie_title = movies.sample(1)["title"].values[0]
         elif search_query:
-            titles_lower = [t.lower() for t in titles]
-            matches = difflib.get_close_matches(
-                search_query.lower(), titles_lower, n=1, cutoff=0.3
-            )
-            if matches:
-                match = matches[0]
-                idx = titles_lower.index(match)
+            idx = title_matcher.best(search_query)
+            if idx is not None:
                 movie_title = titles[idx]
+        st.session_state["rec_title"] = movie_title
+
+    # Keep showing the last pick when another widget triggers a rerun.
+    movie_title = st.session_state.get("rec_title")
+    if movie_title:
         st.subheader(f"Selected: {movie_title}")
         try:
             recs = recommend(movie_title, top_n=top_n)
@@ -189,31 +144,22 @@ elif page == "Recommendations":
 
 elif page == "Analytics":
     st.title("Analytics")
-    total_movies = int(len(movies))
-    tags = []
-    if "tags" in movies.columns:
-        for t in movies["tags"].dropna():
-            tags.extend(str(t).split())
-    unique_tags = len(set(tags)) if tags else 0
+    catalog = get_catalog()
+    stats = load_stats(model.version, catalog.version if catalog is not None else None)
     col1, col2 = st.columns(2)
-    col1.metric("Total movies", total_movies)
-    col2.metric("Unique tags", unique_tags)
+    col1.metric("Total movies", stats["total_movies"])
+    col2.metric("Unique tags", stats["unique_tags"])
 
-    if tags:
-        top_tags = Counter(tags).most_common(10)
-        tag_df = pd.DataFrame(top_tags, columns=["tag", "count"])
+    if stats["tag_labels"]:
+        tag_df = pd.DataFrame(
+            {"tag": stats["tag_labels"], "count": stats["tag_counts"]}
+        )
         st.subheader("Top tags")
         st.bar_chart(tag_df.set_index("tag"))
 
-    year_col = None
-    if "release_date" in movies.columns:
-        year_col = movies["release_date"].astype(str).str[:4]
-    elif "year" in movies.columns:
-        year_col = movies["year"].astype(str)
-    if year_col is not None:
-        year_counts = year_col.value_counts().sort_index()
+    if stats["year_labels"]:
         year_df = pd.DataFrame(
-            {"year": year_counts.index, "count": year_counts.values}
+            {"year": stats["year_labels"], "count": stats["year_counts"]}
         )
         st.subheader("Movies per year")
         st.line_chart(year_df.set_index("year"))
@@ -0,0 +1,81 @@
+"""Recall@10 and latency of the IVF index against exact sparse scoring.
+
+Runs on the real catalog and on a synthetic 200k-title catalog whose tags
+mix two random real movies. Recall is measured against the exact top 10;
+settings that reach ann.RECALL_TARGET are marked with "*", and the row for
+the engine's defaults with "default":
+
+    python benchmarks/bench_ann.py
+"""
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cinematch.ann import DEFAULT_PROBE, DEFAULT_RERANK, RECALL_TARGET, build_ivf
+from cinematch.artifacts import read_movies_pickle
+from cinematch.engines import SparseEngine
+from cinematch.vectors import tag_vectors
+
+MOVIES_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Movies"
+)
+QUERIES = 200
+TOP_N = 10
+SETTINGS = [(p, 200) for p in (4, 8, 16, 32, 48, 64)] + [(32, 100), (32, 500)]
+
+
+def expand(tags, size, rng):
+    out = list(tags)
+    while len(out) < size:
+        out.append("{} {}".format(rng.choice(tags), rng.choice(tags)))
+    return out
+
+
+def timed_queries(engine, rows, **kwargs):
+    results = []
+    start = time.perf_counter()
+    for row in rows:
+        results.append(engine.query(int(row), TOP_N, **kwargs)[0])
+    return results, (time.perf_counter() - start) / len(rows)
+
+
+def main():
+    rng = random.Random(0)
+    tags = read_movies_pickle(MOVIES_DIR)["tags"].tolist()
+    for size in (len(tags), 200_000):
+        vectors, _ = tag_vectors(expand(tags, size, rng))
+        start = time.perf_counter()
+        index = build_ivf(vectors)
+        build = time.perf_counter() - start
+
+        rows = np.random.default_rng(0).integers(size, size=QUERIES)
+        exact, exact_latency = timed_queries(SparseEngine(vectors), rows)
+        print(
+            "\n{} titles, {} lists (build {:.1f}s), exact sparse {:.2f} ms".format(
+                size, index.n_lists, build, exact_latency * 1e3
+            )
+        )
+        header = ("probe", "rerank", "recall@10", "query (ms)", "")
+        print("{:>8} {:>8} {:>12} {:>12} {}".format(*header))
+        for n_probe, rerank in SETTINGS:
+            found, latency = timed_queries(index, rows, n_probe=n_probe, rerank=rerank)
+            recall = np.mean(
+                [len(np.intersect1d(f, e)) / TOP_N for f, e in zip(found, exact)]
+            )
+            notes = ["*"] if recall >= RECALL_TARGET else []
+            if (n_probe, rerank) == (DEFAULT_PROBE, DEFAULT_RERANK):
+                notes.append("default")
+            print(
+                "{:>8} {:>8} {:>12.3f} {:>12.3f} {}".format(
+                    n_probe, rerank, recall, latency * 1e3, " ".join(notes)
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Batch recommendation throughput in seeds per second.
+
+Uses every movie in the catalog as a seed. "score" compares one
+``engine.query`` per seed with one ``query_batch`` call; "api" compares
+``recommend_batch`` called per seed with one call for all seeds (ids and
+scores only, no TMDB):
+
+    python benchmarks/bench_batch.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cinematch.artifacts import open_model
+from cinematch.engines import DenseEngine, load_engine, query_batch
+from cinematch.recommender import MovieIndex, Recommender
+
+MOVIES_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Movies"
+)
+TOP_N = 10
+ENGINES = ("neighbors", "sparse", "dense", "ann")
+
+
+def rate(fn, count):
+    start = time.perf_counter()
+    fn()
+    return count / (time.perf_counter() - start)
+
+
+def make_engine(model, mode):
+    if mode == "dense":
+        # Built in memory: open_model(dense=True) would rewrite Movies/model.
+        vectors = model.vectors
+        return DenseEngine((vectors @ vectors.T).toarray())
+    return load_engine(model, mode)
+
+
+def main():
+    model = open_model(MOVIES_DIR)
+    index = MovieIndex(model.movie_ids, model.titles.tolist())
+    seeds = index.movie_ids.tolist()
+    rows = np.arange(len(seeds))
+    print("{} seeds, top {}, seeds/s".format(len(seeds), TOP_N))
+    header = ("engine", "score loop", "score batch", "api loop", "api batch")
+    print("{:<10} {:>12} {:>12} {:>12} {:>12}".format(*header))
+    for mode in ENGINES:
+        engine = make_engine(model, mode)
+        recommender = Recommender(index, engine)
+        rates = (
+            rate(lambda: [engine.query(int(row), TOP_N) for row in rows], len(rows)),
+            rate(lambda: query_batch(engine, rows, TOP_N), len(rows)),
+            rate(
+                lambda: [recommender.recommend_batch([s], TOP_N) for s in seeds],
+                len(seeds),
+            ),
+            rate(lambda: recommender.recommend_batch(seeds, TOP_N), len(seeds)),
+        )
+        print("{:<10} {:>12,.0f} {:>12,.0f} {:>12,.0f} {:>12,.0f}".format(mode, *rates))
+
+
+if __name__ == "__main__":
+    main()
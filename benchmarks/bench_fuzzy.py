@@ -0,0 +1,89 @@
+"""Trigram fuzzy index against difflib.get_close_matches over every title.
+
+Reports per-query latency at the real catalog size and at 100k titles, and
+how often both return the same top match for misspelled/partial queries.
+
+    python benchmarks/bench_fuzzy.py
+"""
+import difflib
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cinematch.artifacts import read_movies_pickle
+from cinematch.fuzzy import FuzzyTitleIndex
+
+MOVIES_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Movies"
+)
+QUERIES = 200
+
+
+def mangle(title, rng):
+    chars = list(title.lower())
+    kind = rng.randrange(3)
+    if kind == 0 and len(chars) > 3:  # typo
+        i = rng.randrange(len(chars) - 1)
+        chars[i], chars[i + 1] = chars[i + 1], chars[i]
+        del chars[rng.randrange(len(chars))]
+    elif kind == 1:  # prefix
+        chars = chars[: max(3, len(chars) * 2 // 3)]
+    else:  # dropped word
+        words = "".join(chars).split()
+        if len(words) > 1:
+            del words[rng.randrange(len(words))]
+        chars = list(" ".join(words))
+    return "".join(chars)
+
+
+def difflib_best(query, titles_lower):
+    matches = difflib.get_close_matches(query, titles_lower, n=1, cutoff=0.3)
+    return matches[0] if matches else None
+
+
+def expand(titles, size, rng):
+    """Synthetic catalog: real titles plus suffixed variants."""
+    out = list(titles)
+    while len(out) < size:
+        out.append("{} {}".format(rng.choice(titles), rng.randrange(1, 10**6)))
+    return out
+
+
+def main():
+    rng = random.Random(0)
+    titles = read_movies_pickle(MOVIES_DIR)["title"].tolist()
+    queries = [mangle(rng.choice(titles), rng) for _ in range(QUERIES)]
+
+    print("{:>8} {:>14} {:>14} {:>10}".format("titles", "difflib (ms)", "index (ms)", "agree"))
+    for size in (len(titles), 100_000):
+        catalog = expand(titles, size, rng)
+        titles_lower = [t.lower() for t in catalog]
+        index = FuzzyTitleIndex(catalog)
+
+        sample = queries if size < 10_000 else queries[:20]
+        start = time.perf_counter()
+        expected = [difflib_best(q, titles_lower) for q in sample]
+        old = (time.perf_counter() - start) / len(sample)
+
+        start = time.perf_counter()
+        for q in queries:
+            index.best(q)
+        new = (time.perf_counter() - start) / len(queries)
+
+        got = [index.best(q) for q in sample]
+        agree = sum(
+            (g is None and e is None) or (g is not None and titles_lower[g] == e)
+            for g, e in zip(got, expected)
+        )
+        print(
+            "{:>8} {:>14.2f} {:>14.3f} {:>9.0%}".format(
+                size, old * 1e3, new * 1e3, agree / len(sample)
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Latency of the Flask pages with and without the rendered-page cache.
+
+"render" purges the cache before every request, so it pays for the
+recommendations, TMDB details (from the warm metadata cache) and template;
+"cached" is a hit. Point TMDB_API_URL at tools/tmdb_stub.py to keep the
+network out of it:
+
+    python tools/tmdb_stub.py --port 8765 --delay 0.05 &
+    TMDB_API_URL=http://127.0.0.1:8765/3 python benchmarks/bench_pages.py
+"""
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Keep the cache warmer from filling pages behind the benchmark's back.
+os.environ.setdefault("CINEMATCH_WARMER", "0")
+
+import flask_app
+
+URLS = ("/", "/recommend?movie=Avatar&n=6", "/movie/19995")
+REQUESTS = 50
+
+
+def timed(client, url, purge):
+    times = []
+    for _ in range(REQUESTS):
+        if purge:
+            flask_app.page_cache.purge()
+        start = time.perf_counter()
+        response = client.get(url)
+        times.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.status_code
+    return statistics.median(times) * 1e3
+
+
+def main():
+    client = flask_app.app.test_client()
+    for url in URLS:
+        client.get(url)  # fill the TMDB cache
+    print("{:<32} {:>12} {:>12} {:>8}".format("page", "render (ms)", "cached (ms)", "speedup"))
+    for url in URLS:
+        render = timed(client, url, purge=True)
+        cached = timed(client, url, purge=False)
+        print("{:<32} {:>12.2f} {:>12.2f} {:>7.1f}x".format(url, render, cached, render / cached))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Poster latency and size: TMDB's w500 vs. the local /poster proxy.
+
+"direct" downloads the w500 image the cards used to point at; "cold" asks
+the proxy for the card size (w342) with an empty image cache, "cached" asks
+again and "revalidate" sends the ETag back and gets a 304. Run it against
+tools/tmdb_stub.py, which also serves generated poster images:
+
+    python tools/tmdb_stub.py --port 8765 --delay 0.05 &
+    TMDB_API_URL=http://127.0.0.1:8765/3 \\
+    TMDB_IMAGE_URL=http://127.0.0.1:8765/t/p python benchmarks/bench_posters.py
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("CINEMATCH_WARMER", "0")
+os.environ.setdefault("CINEMATCH_POSTER_CACHE", tempfile.mkdtemp())
+
+import flask_app
+from cinematch.posters import get_proxy
+from cinematch.tmdb import fetch_poster_path
+from cinematch.tmdb_client import get_client
+
+POSTERS = 30
+CARD_SIZE = "w342"
+
+
+def timed(fetch, movie_ids):
+    times, sizes = [], []
+    for movie_id in movie_ids:
+        start = time.perf_counter()
+        size = fetch(movie_id)
+        times.append(time.perf_counter() - start)
+        sizes.append(size)
+    return statistics.median(times) * 1e3, statistics.mean(sizes) / 1024
+
+
+def main():
+    client = flask_app.app.test_client()
+    movie_ids = [
+        movie_id
+        for movie_id in flask_app.movie_index.movie_ids[: POSTERS * 2].tolist()
+        if fetch_poster_path(movie_id)
+    ][:POSTERS]
+    base_url = get_proxy().base_url
+    etags = {}
+
+    def direct(movie_id):
+        url = "{}/w500{}".format(base_url, fetch_poster_path(movie_id))
+        return len(get_client().session.get(url).content)
+
+    def proxied(movie_id):
+        response = client.get("/poster/{}/{}".format(movie_id, CARD_SIZE))
+        assert response.status_code == 200, response.status_code
+        etags[movie_id] = response.headers["ETag"]
+        return len(response.data)
+
+    def revalidate(movie_id):
+        response = client.get(
+            "/poster/{}/{}".format(movie_id, CARD_SIZE),
+            headers={"If-None-Match": etags[movie_id]},
+        )
+        assert response.status_code == 304, response.status_code
+        return len(response.data)
+
+    print("{} posters".format(len(movie_ids)))
+    print("{:<12} {:>12} {:>14}".format("mode", "median (ms)", "KB / poster"))
+    for name, fetch in (
+        ("direct", direct),
+        ("cold", proxied),
+        ("cached", proxied),
+        ("revalidate", revalidate),
+    ):
+        print("{:<12} {:>12.2f} {:>14.1f}".format(name, *timed(fetch, movie_ids)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Profile suggestions: one aggregate vs. one query per history item.
+
+"loop" queries each history item's neighbors separately and merges them in
+a dict, which is what calling recommend() per item amounts to; "aggregate"
+is Recommender.similar_to_history. Both exclude seen movies and use the
+same recency weights; no TMDB lookups are made:
+
+    python benchmarks/bench_profile.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cinematch.artifacts import open_model
+from cinematch.engines import DenseEngine, load_engine
+from cinematch.recommender import RECENCY_DECAY, MovieIndex, Recommender
+
+MOVIES_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Movies"
+)
+ENGINES = ("neighbors", "sparse", "dense")
+HISTORY = 12
+TOP_N = 8
+NEIGHBORS = 50
+REPEAT = 200
+
+
+def loop(recommender, movie_ids):
+    totals = {}
+    seen = set()
+    for i, movie_id in enumerate(movie_ids):
+        row = recommender.index.row_for_id(movie_id)
+        seen.add(row)
+        rows, scores = recommender.similar_rows(row, NEIGHBORS)
+        for r, score in zip(rows.tolist(), scores.tolist()):
+            totals[r] = totals.get(r, 0.0) + score * RECENCY_DECAY**i
+    ranked = sorted(
+        (item for item in totals.items() if item[0] not in seen),
+        key=lambda item: (-item[1], item[0]),
+    )
+    return ranked[:TOP_N]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    return (time.perf_counter() - start) / REPEAT * 1e3
+
+
+def make_engine(model, mode):
+    if mode == "dense":
+        # Built in memory: open_model(dense=True) would rewrite Movies/model.
+        vectors = model.vectors
+        return DenseEngine((vectors @ vectors.T).toarray())
+    return load_engine(model, mode)
+
+
+def main():
+    model = open_model(MOVIES_DIR)
+    index = MovieIndex(model.movie_ids, model.titles.tolist())
+    rng = np.random.default_rng(0)
+    history = rng.choice(index.movie_ids, HISTORY, replace=False).tolist()
+    print("history of {}, top {}".format(HISTORY, TOP_N))
+    print("{:<10} {:>12} {:>16}".format("engine", "loop (ms)", "aggregate (ms)"))
+    for mode in ENGINES:
+        recommender = Recommender(index, make_engine(model, mode))
+        per_item = timed(lambda: loop(recommender, history))
+        aggregate = timed(lambda: recommender.similar_to_history(history, TOP_N))
+        print("{:<10} {:>12.3f} {:>16.3f}".format(mode, per_item, aggregate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Build time and query latency of the BM25 tag index.
+
+Runs on the real catalog and on the catalog repeated 20x (~96k documents).
+
+    python benchmarks/bench_search.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cinematch.artifacts import read_movies_pickle
+from cinematch.search import SearchIndex, tokenize
+
+MOVIES_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Movies"
+)
+QUERIES = 300
+
+
+def main():
+    rng = random.Random(0)
+    tags = read_movies_pickle(MOVIES_DIR)["tags"].tolist()
+    print(
+        "{:>8} {:>10} {:>12} {:>12} {:>12}".format(
+            "docs", "build (s)", "1 term (ms)", "AND-2 (ms)", "OR-3 (ms)"
+        )
+    )
+    for repeat in (1, 20):
+        corpus = tags * repeat
+        start = time.perf_counter()
+        index = SearchIndex(corpus)
+        build = time.perf_counter() - start
+
+        def words(k):
+            return " ".join(rng.choice(tokenize(rng.choice(tags))) for _ in range(k))
+
+        timings = []
+        for k, op in ((1, "and"), (2, "and"), (3, "or")):
+            queries = [words(k) for _ in range(QUERIES)]
+            start = time.perf_counter()
+            for q in queries:
+                index.search(q, n=20, op=op)
+            timings.append((time.perf_counter() - start) / QUERIES * 1e3)
+        print(
+            "{:>8} {:>10.2f} {:>12.3f} {:>12.3f} {:>12.3f}".format(
+                len(corpus), build, *timings
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Time to first byte and to first card, streamed vs. buffered pages.
+
+Serves the Flask app on a local port and reads each page over a socket with
+a cold TMDB cache and an empty page cache, so every card is a lookup. Run
+it against tools/tmdb_stub.py with uneven latency to see the slowest lookup
+hold up buffered pages:
+
+    python tools/tmdb_stub.py --port 8765 --delay 0.05 --jitter 0.4 &
+    TMDB_API_URL=http://127.0.0.1:8765/3 python benchmarks/bench_stream.py
+"""
+import http.client
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("CINEMATCH_WARMER", "0")
+os.environ.setdefault(
+    "CINEMATCH_TMDB_CACHE", os.path.join(tempfile.mkdtemp(), "tmdb.sqlite")
+)
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+import flask_app
+from cinematch.tmdb import get_cache
+
+URLS = ("/", "/recommend?movie=Avatar&n=6", "/movie/19995")
+REQUESTS = 10
+CARD = b'class="card '
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args):
+        pass
+
+
+def fetch(port, url):
+    """Seconds to the first byte, the first card and the end of the body."""
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    start = time.perf_counter()
+    conn.request("GET", url)
+    response = conn.getresponse()
+    first_byte = first_card = None
+    body = b""
+    while True:
+        chunk = response.read1(65536)
+        if not chunk:
+            break
+        now = time.perf_counter() - start
+        if first_byte is None:
+            first_byte = now
+        body += chunk
+        if first_card is None and CARD in body:
+            first_card = now
+    conn.close()
+    return first_byte, first_card, time.perf_counter() - start
+
+
+def main():
+    server = make_server(
+        "127.0.0.1", 0, flask_app.app, threaded=True, request_handler=QuietHandler
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(
+        "{:<30} {:<9} {:>10} {:>12} {:>11}".format(
+            "page", "mode", "TTFB (ms)", "1st card", "total"
+        )
+    )
+    for url in URLS:
+        for stream in (False, True):
+            flask_app.stream_pages = stream
+            runs = []
+            for _ in range(REQUESTS):
+                flask_app.page_cache.purge()
+                get_cache().clear()
+                runs.append(fetch(server.port, url))
+            medians = [statistics.median(r[i] for r in runs) * 1e3 for i in range(3)]
+            print(
+                "{:<30} {:<9} {:>10.1f} {:>12.1f} {:>11.1f}".format(
+                    url, "streamed" if stream else "buffered", *medians
+                )
+            )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Rerun latency of the Streamlit app, per page.
+
+Drives Movies/app.py with streamlit's AppTest harness: the first run of a
+page pays for loading, later runs are what a widget interaction costs.
+Point TMDB_API_URL at tools/tmdb_stub.py to keep the network out of it:
+
+    python tools/tmdb_stub.py --port 8765 --delay 0.05 &
+    TMDB_API_URL=http://127.0.0.1:8765/3 python benchmarks/bench_streamlit.py
+"""
+import os
+import statistics
+import sys
+import time
+
+from streamlit.testing.v1 import AppTest
+
+APP = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Movies", "app.py"
+)
+PAGES = ("Home", "Recommendations", "Analytics", "Profile")
+RERUNS = 20
+
+
+def timed(app):
+    start = time.perf_counter()
+    app.run(timeout=60)
+    elapsed = time.perf_counter() - start
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    return elapsed
+
+
+def main():
+    print("{:>16} {:>12} {:>14} {:>14}".format("page", "first (ms)", "rerun p50", "rerun max"))
+    for page in PAGES:
+        app = AppTest.from_file(APP, default_timeout=60)
+        first = timed(app)
+        app.sidebar.radio[0].set_value(page)
+        first += timed(app)
+        reruns = [timed(app) for _ in range(RERUNS)]
+        print(
+            "{:>16} {:>12.1f} {:>14.1f} {:>14.1f}".format(
+                page,
+                first * 1e3,
+                statistics.median(reruns) * 1e3,
+                max(reruns) * 1e3,
+            )
+        )
+    sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Latency of the top-k engine against the old sorted(enumerate(...)) path.
+
+    python benchmarks/bench_topk.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cinematch.topk import top_k
+
+SIZES = [5_000, 100_000, 1_000_000]
+TOP_N = 10
+
+
+def legacy(distances, top_n):
+    return sorted(list(enumerate(distances)), reverse=True, key=lambda x: x[1])[
+        1 : top_n + 1
+    ]
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'items':>10} {'sorted (ms)':>12} {'top_k (ms)':>12} {'speedup':>8}")
+    for n in SIZES:
+        row = rng.random(n)
+        query = int(rng.integers(n))
+        row[query] = 1.0
+        repeat = 3 if n >= 1_000_000 else 10
+        old = timed(lambda: legacy(row, TOP_N), repeat)
+        new = timed(lambda: top_k(row, TOP_N, exclude=query), repeat)
+        expected = [i for i, _ in legacy(row, TOP_N)]
+        assert list(top_k(row, TOP_N, exclude=query)[0]) == expected
+        print(f"{n:>10} {old * 1e3:>12.2f} {new * 1e3:>12.3f} {old / new:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
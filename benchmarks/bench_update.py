@@ -0,0 +1,75 @@
+"""Incremental model update against a full neighbor rebuild.
+
+Changes and adds a few movies in the real model, then checks the patched
+neighbor lists against a rebuild from the same vectors:
+
+    python benchmarks/bench_update.py
+"""
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cinematch.artifacts import open_model
+from cinematch.neighbors import build_neighbor_index
+from cinematch.update import apply_changes
+
+MOVIES_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Movies"
+)
+
+
+def make_changes(model, count, rng):
+    tags = model.tags.tolist()
+    n = len(model)
+    changes = []
+    for i in range(count):
+        text = "{} {}".format(rng.choice(tags), rng.choice(tags))
+        if i % 2:
+            row = rng.randrange(n)
+            changes.append((int(model.movie_ids[row]), model.titles[row], text))
+        else:
+            changes.append((10**7 + i, "New movie {}".format(i), text))
+    return changes
+
+
+def main():
+    rng = random.Random(0)
+    model = open_model(MOVIES_DIR)
+    print(
+        "{:>8} {:>12} {:>12} {:>10} {:>12} {:>10}".format(
+            "changes", "update (s)", "rebuild (s)", "patched", "recomputed", "exact"
+        )
+    )
+    for count in (1, 10, 100):
+        changes = make_changes(model, count, rng)
+        start = time.perf_counter()
+        contents, stats = apply_changes(model, changes)
+        update = time.perf_counter() - start
+
+        start = time.perf_counter()
+        full = build_neighbor_index(contents["vectors"], k=model.neighbors.k)
+        rebuild = time.perf_counter() - start
+
+        got = contents["index"]
+        same = np.all(got.ids == full.ids, axis=1) | np.all(
+            got.scores == full.scores, axis=1
+        )
+        print(
+            "{:>8} {:>12.3f} {:>12.3f} {:>10} {:>12} {:>9.2%}".format(
+                count,
+                update,
+                rebuild,
+                stats["patched"],
+                stats["recomputed"],
+                same.mean(),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""First-visit latency after a restart, with and without the cache warmer.
+
+Writes a popularity snapshot with Zipf-distributed traffic over the catalog,
+then starts the Flask app twice in a fresh process with an empty TMDB cache:
+once with CINEMATCH_WARMER=0 and once with the warmer loading the snapshot.
+Each run times the first request to the detail page of the 20 most popular
+movies. Point TMDB_API_URL at tools/tmdb_stub.py with a realistic delay:
+
+    python tools/tmdb_stub.py --port 8765 --delay 0.05 &
+    TMDB_API_URL=http://127.0.0.1:8765/3 python benchmarks/bench_warmer.py
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cinematch.warmer import Popularity, load_snapshot, save_snapshot
+
+VISITED = 20
+HITS = 5000
+
+
+def child():
+    import flask_app
+
+    warmup = 0.0
+    if flask_app.warmer_enabled():
+        flask_app.warmer.start()  # what the first request would do
+        while flask_app.warmer.rounds == 0:
+            time.sleep(0.05)
+        warmup = flask_app.warmer.last_round["seconds"]
+    popularity = Popularity()
+    load_snapshot(os.environ["CINEMATCH_WARMER_SNAPSHOT"], popularity)
+    top = [key for key, _ in popularity.top(VISITED)]
+    client = flask_app.app.test_client()
+    times = []
+    for movie_id in top:
+        start = time.perf_counter()
+        client.get("/movie/{}".format(movie_id)).get_data()
+        times.append(time.perf_counter() - start)
+    result = {"warmup": warmup, "median": statistics.median(times), "max": max(times)}
+    print(json.dumps(result))
+
+
+def main():
+    import numpy as np
+
+    from cinematch.artifacts import open_model
+
+    movie_ids = open_model(os.path.join(ROOT, "Movies")).movie_ids
+    rng = np.random.default_rng(0)
+    ranks = np.minimum(rng.zipf(1.3, HITS), len(movie_ids)) - 1
+    popularity = Popularity()
+    for movie_id in movie_ids[rng.permutation(len(movie_ids))[ranks]].tolist():
+        popularity.hit(movie_id)
+
+    header = ("warmer", "warm-up (s)", "median (ms)", "max (ms)")
+    print("{:<10} {:>12} {:>14} {:>14}".format(*header))
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = os.path.join(tmp, "popularity.json")
+        for enabled in ("0", "1"):
+            save_snapshot(snapshot, popularity)
+            env = dict(
+                os.environ,
+                CINEMATCH_WARMER=enabled,
+                CINEMATCH_WARMER_SNAPSHOT=snapshot,
+                CINEMATCH_WARMER_RATE="50",
+                CINEMATCH_WARMER_WORKERS="4",
+                CINEMATCH_TMDB_CACHE=os.path.join(tmp, "tmdb-{}.sqlite".format(enabled)),
+            )
+            out = subprocess.run(
+                [sys.executable, __file__, "--child"],
+                env=env,
+                cwd=ROOT,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            result = json.loads(out.strip().splitlines()[-1])
+            print(
+                "{:<10} {:>12.2f} {:>14.2f} {:>14.2f}".format(
+                    "on" if enabled == "1" else "off",
+                    result["warmup"],
+                    result["median"] * 1e3,
+                    result["max"] * 1e3,
+                )
+            )
+
+
+if __name__ == "__main__":
+    if "--child" in sys.argv[1:]:
+        child()
+    else:
+        main()
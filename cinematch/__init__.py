@@ -0,0 +1 @@
+"""Shared recommendation engine used by the Flask and Streamlit apps."""
@@ -0,0 +1,57 @@
+"""Dataset statistics for the analytics pages, computed once per model.
+
+The tag counts need a pass over every tag string, so ``save_model`` stores
+them in the model header when the model is built; models from before that
+compute them the first time they are asked for. The stats are then served
+from memory until the model or the local catalog changes.
+"""
+import threading
+from collections import Counter
+
+import numpy as np
+
+TOP_TAGS = 10
+SAMPLE_TITLES = 5
+
+_stats = {}
+_lock = threading.Lock()
+
+
+def tag_stats(tags):
+    """Distinct tag count and the most common tags, as stored in the header."""
+    counts = Counter(" ".join(str(t) for t in tags).split())
+    return {"unique": len(counts), "top": counts.most_common(TOP_TAGS)}
+
+
+def compute_stats(titles, tags, years=None):
+    """``tags`` is a ``tag_stats()`` result."""
+    year_labels, year_counts = [], []
+    if years is not None:
+        years = np.asarray(years)
+        values, freq = np.unique(years[years > 0], return_counts=True)
+        year_labels = [str(v) for v in values.tolist()]
+        year_counts = freq.tolist()
+    return {
+        "total_movies": len(titles),
+        "unique_tags": tags["unique"],
+        "sample_titles": [titles[i] for i in range(min(SAMPLE_TITLES, len(titles)))],
+        "tag_labels": [tag for tag, _ in tags["top"]],
+        "tag_counts": [count for _, count in tags["top"]],
+        "year_labels": year_labels,
+        "year_counts": year_counts,
+    }
+
+
+def get_stats(model, catalog=None):
+    """Cached stats for ``model`` (and the hydrated ``catalog``, if any)."""
+    key = (model.version, catalog.version if catalog is not None else None)
+    with _lock:
+        stats = _stats.get(key)
+        if stats is None:
+            years = catalog.years(model.movie_ids) if catalog is not None else None
+            tags = model.header.get("tag_stats") or tag_stats(model.tags.tolist())
+            stats = compute_stats(model.titles, tags, years)
+            stats["model_version"] = model.version
+            _stats.clear()
+            _stats[key] = stats
+        return stats
@@ -0,0 +1,348 @@
+"""Approximate nearest neighbors over the tag vectors (truncated SVD + IVF).
+
+The sparse tag vectors are projected onto their ``dim`` leading singular
+directions, which keeps the tag co-occurrence structure that cosine
+similarity depends on far better than a random projection of the same size.
+Spherical k-means splits the projected catalog into ``n_lists`` clusters. A
+query scores the centroids, scans the ``n_probe`` closest clusters with one
+dense product each, and reranks the best ``rerank`` candidates with the
+exact sparse cosine.
+
+The knobs trade recall for latency: more probes and a larger rerank raise
+recall, more lists make each probe cheaper. Nothing N x N is built or
+scanned. Recall@10 against exact scoring is measured on a sample when the
+index is built (and again for other knobs), and ``open_ivf`` refuses an
+index below RECALL_TARGET. The index is a few NumPy arrays saved next to
+the model:
+
+    python -m cinematch.ann Movies/model --lists 256
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from cinematch.artifacts import (
+    HEADER_NAME,
+    header_version,
+    publish,
+    read_arrays,
+    write_array,
+)
+from cinematch.topk import top_k
+
+FORMAT_VERSION = 2
+DIM = 128
+# Measured with benchmarks/bench_ann.py: recall@10 0.905 at 200k titles.
+DEFAULT_PROBE = 32
+DEFAULT_RERANK = 200
+RECALL_TARGET = 0.9
+RECALL_SAMPLE = 200
+RECALL_K = 10
+ITERATIONS = 10
+TRAIN_SIZE = 50_000
+CHUNK_SIZE = 8192
+LISTS_ENV = "CINEMATCH_ANN_LISTS"
+PROBE_ENV = "CINEMATCH_ANN_PROBE"
+RERANK_ENV = "CINEMATCH_ANN_RERANK"
+MIN_RECALL_ENV = "CINEMATCH_ANN_MIN_RECALL"
+ARRAYS = ("projection", "centroids", "offsets", "members", "positions", "embeddings")
+
+
+def default_lists(n):
+    """About sqrt(n) lists, which balances centroid and member scoring."""
+    return int(min(max(round(np.sqrt(n)), 1), 4096))
+
+
+def _normalize(rows):
+    norms = np.linalg.norm(rows, axis=1, keepdims=True)
+    np.maximum(norms, 1e-12, out=norms)
+    return rows / norms
+
+
+def svd_projection(vectors, dim, seed=0):
+    """(n_terms, dim) matrix of the leading right singular vectors."""
+    from sklearn.utils.extmath import randomized_svd
+
+    dim = max(1, min(dim, min(vectors.shape) - 1))
+    _, _, components = randomized_svd(vectors, dim, random_state=seed)
+    return np.ascontiguousarray(components.T, dtype=np.float32)
+
+
+def exact_scores(vectors, row, rows):
+    """Cosine of ``row`` with each of ``rows``, straight from the CSR arrays.
+
+    Slicing a few hundred rows out of a scipy matrix costs more than the
+    arithmetic, so the products are summed per row with one bincount.
+    """
+    indptr, indices, data = vectors.indptr, vectors.indices, vectors.data
+    query = np.zeros(vectors.shape[1], dtype=np.float32)
+    own = slice(indptr[row], indptr[row + 1])
+    query[indices[own]] = data[own]
+    starts = indptr[rows]
+    counts = indptr[rows + 1] - starts
+    owner = np.repeat(np.arange(len(rows)), counts)
+    # Position of every stored entry of ``rows`` in ``data``.
+    shift = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+    entries = np.arange(len(owner)) + shift
+    products = data[entries] * query[indices[entries]]
+    scores = np.bincount(owner, weights=products, minlength=len(rows))
+    return scores.astype(np.float32)
+
+
+def project(vectors, projection):
+    """Unit-length dense embeddings of sparse rows, computed in chunks."""
+    out = np.empty((vectors.shape[0], projection.shape[1]), dtype=np.float32)
+    for start in range(0, vectors.shape[0], CHUNK_SIZE):
+        block = vectors[start : start + CHUNK_SIZE] @ projection
+        out[start : start + CHUNK_SIZE] = _normalize(np.asarray(block))
+    return out
+
+
+def _assign(embeddings, centroids):
+    labels = np.empty(embeddings.shape[0], dtype=np.int32)
+    for start in range(0, embeddings.shape[0], CHUNK_SIZE):
+        block = embeddings[start : start + CHUNK_SIZE] @ centroids.T
+        labels[start : start + CHUNK_SIZE] = block.argmax(axis=1)
+    return labels
+
+
+def train_centroids(embeddings, n_lists, iterations=ITERATIONS, seed=0):
+    """Spherical k-means on at most TRAIN_SIZE rows."""
+    rng = np.random.default_rng(seed)
+    n = embeddings.shape[0]
+    sample = embeddings
+    if n > TRAIN_SIZE:
+        sample = embeddings[np.sort(rng.choice(n, TRAIN_SIZE, replace=False))]
+    m = sample.shape[0]
+    n_lists = min(n_lists, m)
+    centroids = sample[rng.choice(m, n_lists, replace=False)]
+    for _ in range(iterations):
+        labels = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        empty = np.flatnonzero(np.bincount(labels, minlength=n_lists) == 0)
+        if empty.size:
+            # Reseed empty clusters with random rows so every list is used.
+            sums[empty] = sample[rng.choice(m, empty.size, replace=False)]
+        centroids = _normalize(sums)
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """Inverted lists over projected tag vectors.
+
+    ``members`` holds the rows of list ``i`` at ``offsets[i]:offsets[i + 1]``
+    and ``embeddings`` is ordered the same way, so scanning a list is one
+    contiguous matrix-vector product. ``positions`` maps a row to its place
+    in that order.
+    """
+
+    def __init__(
+        self,
+        projection,
+        centroids,
+        offsets,
+        members,
+        positions,
+        embeddings,
+        vectors,
+        measured=None,
+    ):
+        self.projection = projection
+        self.centroids = centroids
+        self.offsets = offsets
+        self.members = members
+        self.positions = positions
+        self.embeddings = embeddings
+        self.vectors = vectors
+        self.n_probe = DEFAULT_PROBE
+        self.rerank = DEFAULT_RERANK
+        # Recall@10 per (n_probe, rerank), as measured by recall().
+        self.measured = dict(measured or {})
+
+    @property
+    def n_lists(self):
+        return self.centroids.shape[0]
+
+    def candidates(self, row, n_probe=None, rerank=None):
+        """Rows with the best projected scores in the closest lists."""
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        query = self.embeddings[self.positions[row]]
+        centroid_scores = self.centroids @ query
+        if n_probe < self.n_lists:
+            lists = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+        else:
+            lists = np.arange(self.n_lists)
+        rows, scores = [], []
+        for i in lists:
+            first, last = self.offsets[i], self.offsets[i + 1]
+            rows.append(self.members[first:last])
+            scores.append(self.embeddings[first:last] @ query)
+        rows = np.concatenate(rows)
+        scores = np.concatenate(scores)
+        own = np.flatnonzero(rows == row)
+        exclude = own[0] if own.size else None
+        best, _ = top_k(scores, rerank or self.rerank, exclude=exclude)
+        return rows[best]
+
+    def query(self, row, k, n_probe=None, rerank=None):
+        rows = self.candidates(row, n_probe, max(rerank or self.rerank, k))
+        rows = np.sort(rows).astype(np.int64)
+        best, scores = top_k(exact_scores(self.vectors, row, rows), k)
+        return rows[best], scores
+
+    def recall(self, sample=RECALL_SAMPLE, seed=0):
+        """Recall@10 against exact scoring at the current knobs.
+
+        Measured on ``sample`` random rows once per knob setting; the value
+        saved with the index is reused.
+        """
+        key = (int(self.n_probe), int(self.rerank))
+        if key not in self.measured:
+            from cinematch.engines import SparseEngine
+
+            exact = SparseEngine(self.vectors)
+            n = self.vectors.shape[0]
+            rows = np.random.default_rng(seed).integers(n, size=min(sample, n))
+            hits = 0
+            for row in rows.tolist():
+                want = exact.query(row, RECALL_K)[0]
+                hits += len(np.intersect1d(self.query(row, RECALL_K)[0], want))
+            self.measured[key] = hits / (len(rows) * min(RECALL_K, n - 1))
+        return self.measured[key]
+
+
+def build_ivf(vectors, n_lists=None, dim=DIM, iterations=ITERATIONS, seed=0):
+    projection = svd_projection(vectors, dim, seed=seed)
+    embeddings = project(vectors, projection)
+    n_lists = n_lists or default_lists(vectors.shape[0])
+    centroids = train_centroids(embeddings, n_lists, iterations=iterations, seed=seed)
+    labels = _assign(embeddings, centroids)
+    members = np.argsort(labels, kind="stable").astype(np.int32)
+    positions = np.empty_like(members)
+    positions[members] = np.arange(len(members), dtype=np.int32)
+    offsets = np.zeros(centroids.shape[0] + 1, dtype=np.int64)
+    np.cumsum(np.bincount(labels, minlength=centroids.shape[0]), out=offsets[1:])
+    return IVFIndex(
+        projection,
+        centroids,
+        offsets,
+        members,
+        positions,
+        embeddings[members],
+        vectors,
+    )
+
+
+def ann_path(model):
+    return os.path.join(os.path.dirname(os.path.abspath(model.path)), "ann")
+
+
+def save_ivf(path, index, model_version):
+    parent = os.path.dirname(os.path.abspath(path))
+    tmp = tempfile.mkdtemp(prefix=".ann-", dir=parent)
+    header = {
+        "format_version": FORMAT_VERSION,
+        "model_version": model_version,
+        "n_lists": int(index.n_lists),
+        "recall": [
+            [n_probe, rerank, value]
+            for (n_probe, rerank), value in sorted(index.measured.items())
+        ],
+        "arrays": {},
+    }
+    try:
+        for name in ARRAYS:
+            write_array(tmp, name, getattr(index, name), header)
+        with open(os.path.join(tmp, HEADER_NAME), "w") as f:
+            json.dump(header, f, indent=2)
+        publish(tmp, path, header_version(header))
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def load_ivf(path, model):
+    """The saved index for ``model``, or None if it is missing or stale."""
+    path = os.path.realpath(path)
+    try:
+        with open(os.path.join(path, HEADER_NAME)) as f:
+            header = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (
+        header.get("format_version") != FORMAT_VERSION
+        or header.get("model_version") != model.version
+    ):
+        return None
+    arrays = read_arrays(path, header)
+    measured = {(p, r): value for p, r, value in header.get("recall", [])}
+    return IVFIndex(*[arrays[name] for name in ARRAYS], model.vectors, measured)
+
+
+def open_ivf(model, n_lists=None, n_probe=None, rerank=None):
+    """Load the model's IVF index, building and saving it when needed.
+
+    The knobs default to CINEMATCH_ANN_LISTS, CINEMATCH_ANN_PROBE and
+    CINEMATCH_ANN_RERANK; a saved index with another list count is rebuilt.
+    Raises ValueError when recall@10 at those knobs is below RECALL_TARGET
+    (or CINEMATCH_ANN_MIN_RECALL), since exact scoring is then the better
+    engine.
+    """
+    n_lists = n_lists or int(os.environ.get(LISTS_ENV, 0))
+    n_lists = n_lists or default_lists(len(model))
+    path = ann_path(model)
+    index = load_ivf(path, model)
+    built = index is None or index.n_lists != min(n_lists, len(model))
+    if built:
+        index = build_ivf(model.vectors, n_lists)
+    index.n_probe = n_probe or int(os.environ.get(PROBE_ENV, 0)) or DEFAULT_PROBE
+    index.rerank = rerank or int(os.environ.get(RERANK_ENV, 0)) or DEFAULT_RERANK
+    recall = index.recall()
+    if built:
+        save_ivf(path, index, model.version)
+    target = float(os.environ.get(MIN_RECALL_ENV, 0)) or RECALL_TARGET
+    if recall < target:
+        raise ValueError(
+            "ANN recall@10 is {:.3f} with {} probes and rerank {}, below {:.2f}; "
+            "raise CINEMATCH_ANN_PROBE or use the neighbors or sparse engine".format(
+                recall, index.n_probe, index.rerank, target
+            )
+        )
+    return index
+
+
+def main():
+    from cinematch.artifacts import load_model
+
+    parser = argparse.ArgumentParser(description="Build the IVF index for a model")
+    parser.add_argument("model", help="model directory, e.g. Movies/model")
+    parser.add_argument("--lists", type=int, default=None, help="default: sqrt(N)")
+    parser.add_argument("--dim", type=int, default=DIM, help="projected dimensions")
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    start = time.perf_counter()
+    index = build_ivf(model.vectors, args.lists, dim=args.dim)
+    recall = index.recall()
+    save_ivf(ann_path(model), index, model.version)
+    sizes = np.diff(index.offsets)
+    print(
+        "wrote {} ({} lists, {}-{} members, recall@10 {:.3f}, {:.2f}s)".format(
+            ann_path(model),
+            index.n_lists,
+            sizes.min(),
+            sizes.max(),
+            recall,
+            time.perf_counter() - start,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
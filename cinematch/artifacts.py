@@ -0,0 +1,386 @@
+"""Memory-mapped model artifacts.
+
+A model is a directory of plain ``.npy`` files plus a small ``header.json``.
+Every array is opened with ``mmap_mode="r"``, so worker processes share the
+OS page cache instead of each holding a private unpickled copy, and opening a
+model does no deserialization.
+
+Each array's SHA-256 is recorded in the header when it is written; the
+model version is a hash of those digests, so two builds from the same input
+get the same version. Serving only checks the header and each array's dtype
+and shape, and maps an array the first time it is used, so startup does not
+read arrays the selected engine never touches. The build commands (or
+CINEMATCH_VERIFY_MODEL=1) check the digests of every array.
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections.abc import Mapping
+
+import numpy as np
+
+from cinematch.analytics import tag_stats
+from cinematch.neighbors import DEFAULT_K, NeighborIndex, build_neighbor_index
+
+FORMAT_VERSION = 4
+HEADER_NAME = "header.json"
+VERIFY_ENV = "CINEMATCH_VERIFY_MODEL"
+# Superseded versions kept next to a published directory, so workers that
+# opened one of them can still map the arrays they have not used yet.
+KEEP_VERSIONS = 3
+
+
+class StringColumn:
+    """UTF-8 strings stored as one byte buffer plus N + 1 offsets."""
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return self.offsets.shape[0] - 1
+
+    def __getitem__(self, i):
+        start, stop = self.offsets[i], self.offsets[i + 1]
+        return self.data[start:stop].tobytes().decode("utf-8")
+
+    def tolist(self):
+        raw = self.data.tobytes()
+        bounds = self.offsets.tolist()
+        return [
+            raw[bounds[i] : bounds[i + 1]].decode("utf-8") for i in range(len(self))
+        ]
+
+    @staticmethod
+    def encode(strings):
+        encoded = [str(s).encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return offsets, data
+
+
+def header_version(header):
+    """Short id of an artifact build, derived from its header."""
+    if "content_hash" in header:
+        return header["content_hash"][:12]
+    raw = json.dumps(header, sort_keys=True).encode("utf-8")
+    return hashlib.sha1(raw).hexdigest()[:12]
+
+
+def array_digest(array):
+    return hashlib.sha256(memoryview(np.ascontiguousarray(array)).cast("B")).hexdigest()
+
+
+def content_hash(header):
+    """Digest over every array's name and SHA-256, independent of write order."""
+    digest = hashlib.sha256()
+    for name in sorted(header["arrays"]):
+        digest.update("{}:{}\n".format(name, header["arrays"][name]["sha256"]).encode())
+    return digest.hexdigest()
+
+
+class Model:
+    def __init__(self, path, header, arrays):
+        self.path = path
+        self.header = header
+        self.arrays = arrays
+        self.movie_ids = arrays["movie_id"]
+        self.titles = StringColumn(arrays["title_offsets"], arrays["title_data"])
+        self.tags = StringColumn(arrays["tags_offsets"], arrays["tags_data"])
+        self.neighbors = NeighborIndex(
+            arrays["neighbor_ids"], arrays["neighbor_scores"]
+        )
+
+    def __len__(self):
+        return self.header["n_movies"]
+
+    @property
+    def version(self):
+        return header_version(self.header)
+
+    @property
+    def vectors(self):
+        """L2-normalised sparse tag matrix (CSR) backed by the mapped arrays."""
+        from scipy.sparse import csr_matrix
+
+        return csr_matrix(
+            (
+                self.arrays["vectors_data"],
+                self.arrays["vectors_indices"],
+                self.arrays["vectors_indptr"],
+            ),
+            shape=(len(self), self.header["n_features"]),
+            copy=False,
+        )
+
+    @property
+    def vocabulary(self):
+        """Vectoriser terms in column order, used to vectorise new movies."""
+        if "vocabulary_offsets" not in self.arrays:
+            return None
+        return StringColumn(
+            self.arrays["vocabulary_offsets"], self.arrays["vocabulary_data"]
+        )
+
+    @property
+    def similarity(self):
+        """Dense N x N matrix, only present when built with ``dense=True``."""
+        return self.arrays.get("similarity")
+
+
+def write_array(directory, name, array, header):
+    array = np.ascontiguousarray(array)
+    np.save(os.path.join(directory, name + ".npy"), array)
+    header["arrays"][name] = {
+        "dtype": array.dtype.str,
+        "shape": list(array.shape),
+        "sha256": array_digest(array),
+    }
+
+
+def open_array(path, name, meta, verify=False):
+    array = np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+    if array.dtype.str != meta["dtype"] or list(array.shape) != meta["shape"]:
+        raise ValueError("{}.npy does not match {}".format(name, HEADER_NAME))
+    if verify and "sha256" in meta and array_digest(array) != meta["sha256"]:
+        raise ValueError("{}.npy is corrupt (content hash mismatch)".format(name))
+    return array
+
+
+class LazyArrays(Mapping):
+    """The arrays listed in a header, each memory-mapped on first use."""
+
+    def __init__(self, path, header):
+        self.path = path
+        self._meta = header["arrays"]
+        self._arrays = {}
+
+    def __getitem__(self, name):
+        array = self._arrays.get(name)
+        if array is None:
+            array = open_array(self.path, name, self._meta[name])
+            array = self._arrays.setdefault(name, array)
+        return array
+
+    def __contains__(self, name):
+        return name in self._meta
+
+    def __iter__(self):
+        return iter(self._meta)
+
+    def __len__(self):
+        return len(self._meta)
+
+
+def read_arrays(path, header, verify=False):
+    """The arrays listed in ``header``, mapped lazily unless ``verify``.
+
+    With ``verify`` every array is opened right away and its SHA-256
+    compared with the header, which reads all of it from disk.
+    """
+    if not verify:
+        return LazyArrays(path, header)
+    return {
+        name: open_array(path, name, meta, verify=True)
+        for name, meta in header["arrays"].items()
+    }
+
+
+def publish(tmp, path, version):
+    """Publish the finished directory ``tmp`` as ``path``.
+
+    ``tmp`` is renamed to a hidden versioned sibling (``.model.<version>``
+    for ``Movies/model``) and ``path`` becomes a symlink to it, swapped in
+    with os.replace. Readers that resolve ``path`` once see the old version
+    or the new one, never a mix and never nothing. A plain directory left at
+    ``path`` by an older build is replaced once, non-atomically.
+    """
+    parent, name = os.path.split(os.path.abspath(path))
+    target = ".{}.{}".format(name, version)
+    try:
+        os.rename(tmp, os.path.join(parent, target))
+    except OSError:
+        # This version is already published, possibly by another worker.
+        shutil.rmtree(tmp, ignore_errors=True)
+    link = os.path.join(
+        parent, ".{}-link-{}-{}".format(name, os.getpid(), threading.get_ident())
+    )
+    os.symlink(target, link)
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    os.replace(link, path)
+    prune_versions(parent, name, keep=target)
+
+
+def prune_versions(parent, name, keep):
+    pattern = re.compile(r"\.{}\.[0-9a-f]+$".format(re.escape(name)))
+    old = [
+        entry
+        for entry in os.scandir(parent)
+        if pattern.match(entry.name) and entry.name != keep
+    ]
+    old.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in old[KEEP_VERSIONS:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def save_model(
+    path,
+    movie_ids,
+    titles,
+    tags,
+    vectors,
+    index,
+    similarity=None,
+    vocabulary=None,
+):
+    """Write a model directory and publish it atomically.
+
+    Files go to a temporary sibling directory that ``publish`` turns into
+    the new version of ``path``, so workers starting concurrently never see
+    a half-written or missing model.
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    tmp = tempfile.mkdtemp(prefix=".model-", dir=parent)
+    header = {
+        "format_version": FORMAT_VERSION,
+        "n_movies": int(len(movie_ids)),
+        "k": int(index.k),
+        "n_features": int(vectors.shape[1]),
+        "built_at": time.time(),
+        "arrays": {},
+    }
+    try:
+        write_array(tmp, "movie_id", np.asarray(movie_ids, dtype=np.int64), header)
+        columns = [("title", titles), ("tags", tags)]
+        if vocabulary is not None:
+            columns.append(("vocabulary", vocabulary))
+        for name, column in columns:
+            offsets, data = StringColumn.encode(column)
+            write_array(tmp, name + "_offsets", offsets, header)
+            write_array(tmp, name + "_data", data, header)
+        write_array(tmp, "vectors_data", vectors.data, header)
+        write_array(tmp, "vectors_indices", vectors.indices, header)
+        write_array(tmp, "vectors_indptr", vectors.indptr, header)
+        write_array(tmp, "neighbor_ids", index.ids, header)
+        write_array(tmp, "neighbor_scores", index.scores, header)
+        if similarity is not None:
+            write_array(tmp, "similarity", np.asarray(similarity), header)
+        header["content_hash"] = content_hash(header)
+        # Derived from the tags, so it stays out of the content hash.
+        header["tag_stats"] = tag_stats(tags)
+        with open(os.path.join(tmp, HEADER_NAME), "w") as f:
+            json.dump(header, f, indent=2)
+        publish(tmp, path, header_version(header))
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def model_format(path):
+    """Format version of the model at ``path``, or None if there is none."""
+    try:
+        with open(os.path.join(path, HEADER_NAME)) as f:
+            return json.load(f).get("format_version")
+    except (OSError, ValueError):
+        return None
+
+
+def load_model(path, verify=False):
+    # Resolved once, so a version published meanwhile cannot be mixed in.
+    path = os.path.realpath(path)
+    with open(os.path.join(path, HEADER_NAME)) as f:
+        header = json.load(f)
+    if header.get("format_version") != FORMAT_VERSION:
+        raise ValueError(
+            "unsupported model format {} in {}".format(
+                header.get("format_version"), path
+            )
+        )
+    if header.get("content_hash") != content_hash(header):
+        raise ValueError("{} has an inconsistent content hash".format(HEADER_NAME))
+    return Model(path, header, read_arrays(path, header, verify=verify))
+
+
+def build_model(movies, path, k=DEFAULT_K, dense=False):
+    """Vectorise ``movies["tags"]`` and write the model directory."""
+    from cinematch.vectors import tag_vectors
+
+    vectors, cv = tag_vectors(movies["tags"])
+    index = build_neighbor_index(vectors, k=k)
+    similarity = None
+    if dense:
+        similarity = (vectors @ vectors.T).toarray()
+    save_model(
+        path,
+        movies["movie_id"].values,
+        movies["title"].values,
+        movies["tags"].values,
+        vectors,
+        index,
+        similarity=similarity,
+        vocabulary=cv.get_feature_names_out(),
+    )
+
+
+def read_movies_pickle(movies_dir):
+    import pandas as pd
+
+    for name in ("movies_dict.pkl", "movies.pkl"):
+        path = os.path.join(movies_dir, name)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                return pd.DataFrame(pickle.load(f)).reset_index(drop=True)
+    raise FileNotFoundError("movies_dict.pkl or movies.pkl not found in Movies directory")
+
+
+def open_model(movies_dir, dense=False):
+    """Open ``<movies_dir>/model``, building it from the pickles if needed."""
+    path = os.path.join(movies_dir, "model")
+    if model_format(path) != FORMAT_VERSION:
+        build_model(read_movies_pickle(movies_dir), path, dense=dense)
+    verify = os.environ.get(VERIFY_ENV) == "1"
+    model = load_model(path, verify=verify)
+    if dense and model.similarity is None:
+        build_model(read_movies_pickle(movies_dir), path, k=model.neighbors.k, dense=True)
+        model = load_model(path, verify=verify)
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the memory-mapped model directory from movies_dict.pkl"
+    )
+    parser.add_argument("movies_dir", help="directory holding movies_dict.pkl")
+    parser.add_argument(
+        "output", nargs="?", help="model directory (default: <movies_dir>/model)"
+    )
+    parser.add_argument("--k", type=int, default=DEFAULT_K)
+    parser.add_argument(
+        "--dense", action="store_true", help="also store the full similarity matrix"
+    )
+    args = parser.parse_args()
+
+    output = args.output or os.path.join(args.movies_dir, "model")
+    build_model(read_movies_pickle(args.movies_dir), output, k=args.k, dense=args.dense)
+    model = load_model(output, verify=True)
+    size = sum(
+        os.path.getsize(os.path.join(output, name)) for name in os.listdir(output)
+    )
+    print(
+        "wrote {} ({} movies x {} neighbors, {:.1f} MB)".format(
+            output, len(model), model.neighbors.k, size / 1e6
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
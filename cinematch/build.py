@@ -0,0 +1,255 @@
+"""Build the model directory from the TMDB 5000 CSV exports.
+
+This is the pipeline from ``Model.ipynb`` as a command:
+
+    python -m cinematch.build tmdb_5000_movies.csv tmdb_5000_credits.csv
+
+Both files are read as streams of rows. The JSON columns are parsed by
+worker processes, every distinct token is Porter-stemmed exactly once across
+the pool, and the result goes through the same vectoriser and neighbor index
+as ``python -m cinematch.artifacts``. Output does not depend on the number of
+workers, so rebuilding the same CSVs reproduces the same model version.
+"""
+import argparse
+import ast
+import csv
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from cinematch.artifacts import load_model, save_model
+from cinematch.neighbors import DEFAULT_K, build_neighbor_index
+from cinematch.startup import StartupProfile
+
+CHUNK_SIZE = 2000
+STEM_CHUNK_SIZE = 20000
+TOP_CAST = 3
+
+_stemmer = None
+
+
+def parse_list(text):
+    """Decode a TMDB JSON column; ``ast.literal_eval`` is the slow fallback."""
+    if isinstance(text, list):
+        return text
+    try:
+        return json.loads(text)
+    except ValueError:
+        return ast.literal_eval(text)
+
+
+def convert(text):
+    return [item["name"] for item in parse_list(text)]
+
+
+def convert3(text):
+    return [item["name"] for item in parse_list(text)[:TOP_CAST]]
+
+
+def fetch_dir(text):
+    for item in parse_list(text):
+        if item["job"] == "Director":
+            return [item["name"]]
+    return []
+
+
+def squash(names):
+    return [name.replace(" ", "") for name in names]
+
+
+def read_rows(path):
+    # The crew column of a single movie can exceed csv's default field limit.
+    csv.field_size_limit(sys.maxsize)
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def parse_credits(rows):
+    """``(title, movie_id, cast + director)`` for each credits row."""
+    out = []
+    for row in rows:
+        if not (row["movie_id"] and row["cast"] and row["crew"]):
+            continue
+        people = squash(convert3(row["cast"])) + squash(fetch_dir(row["crew"]))
+        out.append((row["title"], int(row["movie_id"]), people))
+    return out
+
+
+def parse_movies(rows):
+    """``(title, words)`` for each movie row with every column present."""
+    columns = ("title", "overview", "genres", "keywords")
+    out = []
+    for row in rows:
+        if not all(row[column] for column in columns):
+            continue
+        words = (
+            row["overview"].split()
+            + squash(convert(row["genres"]))
+            + squash(convert(row["keywords"]))
+        )
+        out.append((row["title"], words))
+    return out
+
+
+def record_tags(record):
+    """Stemmed tags for one movie given the TMDB movie and credits columns."""
+    words = (
+        record["overview"].split()
+        + squash(convert(record["genres"]))
+        + squash(convert(record["keywords"]))
+        + squash(convert3(record["cast"]))
+        + squash(fetch_dir(record["crew"]))
+    )
+    return " ".join(stem_words(" ".join(words).lower().split()))
+
+
+def stem_words(words):
+    global _stemmer
+    if _stemmer is None:
+        from nltk.stem.porter import PorterStemmer
+
+        _stemmer = PorterStemmer()
+    return [_stemmer.stem(word) for word in words]
+
+
+def ordered_map(pool, fn, batches, window):
+    """``pool.map`` that keeps at most ``window`` batches in flight.
+
+    ``Executor.map`` submits its whole input up front, which would read both
+    CSVs into memory before the first result comes back.
+    """
+    pending = deque()
+    for batch in batches:
+        pending.append(pool.submit(fn, batch))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def merge(movie_rows, credits):
+    """Inner join on title, in ``movies.merge(credits, on="title")`` order."""
+    for title, words in movie_rows:
+        for movie_id, people in credits.get(title, ()):
+            yield movie_id, title, " ".join(words + people).lower()
+
+
+def build(
+    movies_csv,
+    credits_csv,
+    output,
+    k=DEFAULT_K,
+    dense=False,
+    workers=None,
+    profile=None,
+):
+    """Run the pipeline and write the model to ``output``; returns the profile."""
+    from cinematch.vectors import tag_vectors
+
+    profile = profile or StartupProfile()
+    workers = workers or os.cpu_count() or 1
+    window = 2 * workers
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        with profile.phase("parse credits"):
+            credits = {}
+            batches = chunks(read_rows(credits_csv), CHUNK_SIZE)
+            for parsed in ordered_map(pool, parse_credits, batches, window):
+                for title, movie_id, people in parsed:
+                    credits.setdefault(title, []).append((movie_id, people))
+
+        with profile.phase("parse movies"):
+            movie_ids, titles, docs = [], [], []
+            batches = chunks(read_rows(movies_csv), CHUNK_SIZE)
+            for parsed in ordered_map(pool, parse_movies, batches, window):
+                for movie_id, title, text in merge(parsed, credits):
+                    movie_ids.append(movie_id)
+                    titles.append(title)
+                    docs.append(text)
+            del credits
+
+        with profile.phase("stem"):
+            vocabulary = set()
+            for text in docs:
+                vocabulary.update(text.split())
+            vocabulary = sorted(vocabulary)
+            stems = {}
+            batches = chunks(vocabulary, STEM_CHUNK_SIZE)
+            for words, stemmed in zip(
+                chunks(vocabulary, STEM_CHUNK_SIZE),
+                ordered_map(pool, stem_words, batches, window),
+            ):
+                stems.update(zip(words, stemmed))
+            tags = [" ".join([stems[word] for word in text.split()]) for text in docs]
+            del docs, stems
+
+    with profile.phase("vectorize"):
+        vectors, cv = tag_vectors(tags)
+    with profile.phase("neighbors"):
+        index = build_neighbor_index(vectors, k=k, workers=workers)
+    with profile.phase("write"):
+        similarity = (vectors @ vectors.T).toarray() if dense else None
+        save_model(
+            output,
+            movie_ids,
+            titles,
+            tags,
+            vectors,
+            index,
+            similarity=similarity,
+            vocabulary=cv.get_feature_names_out(),
+        )
+    return profile
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the model directory from the TMDB 5000 CSV files"
+    )
+    parser.add_argument("movies_csv", help="tmdb_5000_movies.csv")
+    parser.add_argument("credits_csv", help="tmdb_5000_credits.csv")
+    parser.add_argument(
+        "--output",
+        default=os.path.join("Movies", "model"),
+        help="model directory (default: Movies/model)",
+    )
+    parser.add_argument("--k", type=int, default=DEFAULT_K)
+    parser.add_argument(
+        "--dense", action="store_true", help="also store the full similarity matrix"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="worker processes (default: CPUs)"
+    )
+    args = parser.parse_args()
+
+    profile = build(
+        args.movies_csv,
+        args.credits_csv,
+        args.output,
+        k=args.k,
+        dense=args.dense,
+        workers=args.workers,
+    )
+    with profile.phase("verify"):
+        model = load_model(args.output, verify=True)
+    print(profile.report())
+    print(
+        "wrote {} ({} movies, version {})".format(
+            args.output, len(model), model.version
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""Two-tier cache: a bounded in-process LRU in front of a SQLite store.
+
+Entries remember when they were fetched. A fresh entry is served as is, a
+stale one is served while a background thread refreshes it, and anything
+older is fetched again. Concurrent misses for the same key share one fetch.
+Loaders raise ``NotFound`` to have the absence itself cached.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class NotFound(Exception):
+    pass
+
+
+class SingleFlight:
+    """One call per key at a time; concurrent callers share its Future."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._inflight
+
+    def run(self, key, fn):
+        """``(future, owner)``; only the owner's call runs ``fn()``."""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future, False
+            future = self._inflight[key] = Future()
+        try:
+            future.set_result(fn())
+        except BaseException as exc:
+            future.set_exception(exc)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+        return future, True
+
+
+class Entry:
+    __slots__ = ("value", "stored_at", "negative")
+
+    def __init__(self, value, stored_at, negative=False):
+        self.value = value
+        self.stored_at = stored_at
+        self.negative = negative
+
+
+class LRUCache:
+    def __init__(self, maxsize=2048, ttl=600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            entry, loaded_at = item
+            if time.time() - loaded_at > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._data[key] = (entry, time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteStore:
+    """Persistent JSON values keyed by string, shared between processes."""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT, stored_at REAL, negative INTEGER)"
+            )
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, stored_at, negative FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        value, stored_at, negative = row
+        return Entry(json.loads(value), stored_at, bool(negative))
+
+    def put(self, key, entry):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                (key, json.dumps(entry.value), entry.stored_at, int(entry.negative)),
+            )
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM entries")
+
+
+class TieredCache:
+    def __init__(
+        self,
+        store=None,
+        memory=None,
+        ttl=7 * 86400,
+        stale_ttl=30 * 86400,
+        negative_ttl=86400,
+        is_negative=None,
+    ):
+        self.memory = memory if memory is not None else LRUCache()
+        self.store = store
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.is_negative = is_negative
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+        self._counters = dict.fromkeys(
+            (
+                "memory_hits",
+                "disk_hits",
+                "misses",
+                "fetches",
+                "stale",
+                "negative",
+                "errors",
+            ),
+            0,
+        )
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats["memory_size"] = len(self.memory)
+        return stats
+
+    def _age_limit(self, entry):
+        return self.negative_ttl if entry.negative else self.ttl
+
+    def _lookup(self, key):
+        entry = self.memory.get(key)
+        if entry is not None:
+            self._count("memory_hits")
+            return entry
+        if self.store is not None:
+            entry = self.store.get(key)
+            if entry is not None:
+                self._count("disk_hits")
+                self.memory.put(key, entry)
+        return entry
+
+    def peek(self, key):
+        """Cached value without fetching, whatever its age (None if absent)."""
+        entry = self._lookup(key)
+        return None if entry is None else entry.value
+
+    def get(self, key, loader):
+        entry = self._lookup(key)
+        if entry is not None:
+            age = time.time() - entry.stored_at
+            limit = self._age_limit(entry)
+            if age <= limit:
+                if entry.negative:
+                    self._count("negative")
+                return entry.value
+            if age <= limit + self.stale_ttl:
+                self._count("stale")
+                self._refresh_in_background(key, loader)
+                return entry.value
+        self._count("misses")
+        return self._load(key, loader).result()
+
+    def _refresh_in_background(self, key, loader):
+        def refresh():
+            try:
+                self._load(key, loader).result()
+            except Exception:
+                pass  # keep serving the stale value
+
+        if key in self._flights:
+            return
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def _load(self, key, loader):
+        def fetch():
+            self._count("fetches")
+            try:
+                value = loader()
+                negative = bool(self.is_negative and self.is_negative(value))
+            except NotFound:
+                value, negative = None, True
+            entry = Entry(value, time.time(), negative)
+            self.memory.put(key, entry)
+            if self.store is not None:
+                self.store.put(key, entry)
+            return value
+
+        future, owner = self._flights.run(key, fetch)
+        if owner and future.exception() is not None:
+            self._count("errors")
+        return future
+
+    def clear(self):
+        self.memory.clear()
+        if self.store is not None:
+            self.store.clear()
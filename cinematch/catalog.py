@@ -0,0 +1,270 @@
+"""Local catalog of TMDB metadata, hydrated offline.
+
+``python -m cinematch.catalog Movies`` fetches the details of every movie in
+the model with bounded concurrency, appending each result to a JSON-lines
+checkpoint so an interrupted run picks up where it stopped. The results are
+then written as a memory-mapped columnar store (``Movies/catalog``) that the
+apps read before going to the network.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from cinematch.artifacts import (
+    StringColumn,
+    header_version,
+    load_model,
+    publish,
+    read_arrays,
+    write_array,
+)
+from cinematch.cache import NotFound
+
+FORMAT_VERSION = 1
+HEADER_NAME = "header.json"
+CATALOG_ENV = "CINEMATCH_CATALOG"
+DEFAULT_CATALOG_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Movies", "catalog"
+)
+
+MISSING, FOUND, NOT_FOUND = 0, 1, 2
+TEXT_COLUMNS = ("title", "overview", "poster_path")
+
+
+class CatalogStore:
+    def __init__(self, path, header, arrays):
+        self.path = path
+        self.header = header
+        self.movie_ids = arrays["movie_id"]
+        self.status = arrays["status"]
+        self.year = arrays["year"]
+        self.rating = arrays["rating"]
+        self.text = {
+            name: StringColumn(arrays[name + "_offsets"], arrays[name + "_data"])
+            for name in TEXT_COLUMNS
+        }
+        ids = self.movie_ids.tolist()
+        self._rows = {int(mid): row for row, mid in enumerate(ids)}
+
+    def __len__(self):
+        return len(self._rows)
+
+    @property
+    def version(self):
+        return header_version(self.header)
+
+    def years(self, movie_ids):
+        """Release year per id (0 when unknown or not hydrated)."""
+        rows = np.asarray([self._rows.get(int(mid), -1) for mid in movie_ids])
+        years = np.zeros(len(rows), dtype=np.int16)
+        known = rows >= 0
+        years[known] = self.year[rows[known]]
+        return years
+
+    def details(self, movie_id):
+        """Details in the tmdb cache format, or None if the store lacks them.
+
+        Movies TMDB reported as missing come back as empty details so they
+        are not looked up again.
+        """
+        row = self._rows.get(int(movie_id))
+        if row is None or self.status[row] == MISSING:
+            return None
+        if self.status[row] == NOT_FOUND:
+            return {}
+        year = int(self.year[row])
+        rating = float(self.rating[row])
+        return {
+            "title": self.text["title"][row] or None,
+            "overview": self.text["overview"][row],
+            "year": str(year) if year else "",
+            "rating": None if np.isnan(rating) else rating,
+            "poster_path": self.text["poster_path"][row] or None,
+        }
+
+
+def load_catalog(path):
+    path = os.path.realpath(path)
+    with open(os.path.join(path, HEADER_NAME)) as f:
+        header = json.load(f)
+    if header.get("format_version") != FORMAT_VERSION:
+        raise ValueError("unsupported catalog format in {}".format(path))
+    return CatalogStore(path, header, read_arrays(path, header))
+
+
+_catalog = None
+_catalog_loaded = False
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """Process-wide catalog store, or None when it has not been hydrated."""
+    global _catalog, _catalog_loaded
+    with _catalog_lock:
+        if not _catalog_loaded:
+            path = os.environ.get(CATALOG_ENV, DEFAULT_CATALOG_PATH)
+            if os.path.exists(os.path.join(path, HEADER_NAME)):
+                _catalog = load_catalog(path)
+            _catalog_loaded = True
+        return _catalog
+
+
+def write_catalog(path, movie_ids, records):
+    """Write the store for ``movie_ids`` from ``{movie_id: record}``."""
+    n = len(movie_ids)
+    status = np.zeros(n, dtype=np.uint8)
+    year = np.zeros(n, dtype=np.int16)
+    rating = np.full(n, np.nan, dtype=np.float32)
+    text = {name: [""] * n for name in TEXT_COLUMNS}
+    for row, movie_id in enumerate(movie_ids):
+        record = records.get(movie_id)
+        if record is None:
+            continue
+        if record["status"] == "not_found":
+            status[row] = NOT_FOUND
+            continue
+        details = record["details"]
+        status[row] = FOUND
+        if details.get("year", "").isdigit():
+            year[row] = int(details["year"])
+        if details.get("rating") is not None:
+            rating[row] = details["rating"]
+        for name in TEXT_COLUMNS:
+            text[name][row] = details.get(name) or ""
+
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=".catalog-", dir=parent)
+    header = {
+        "format_version": FORMAT_VERSION,
+        "n_movies": n,
+        "built_at": time.time(),
+        "arrays": {},
+    }
+    try:
+        write_array(tmp, "movie_id", np.asarray(movie_ids, dtype=np.int64), header)
+        write_array(tmp, "status", status, header)
+        write_array(tmp, "year", year, header)
+        write_array(tmp, "rating", rating, header)
+        for name in TEXT_COLUMNS:
+            offsets, data = StringColumn.encode(text[name])
+            write_array(tmp, name + "_offsets", offsets, header)
+            write_array(tmp, name + "_data", data, header)
+        with open(os.path.join(tmp, HEADER_NAME), "w") as f:
+            json.dump(header, f, indent=2)
+        publish(tmp, path, header_version(header))
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def read_checkpoint(path):
+    records = {}
+    if not os.path.exists(path):
+        return records
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # torn last line from an interrupted run
+            records[record["movie_id"]] = record
+    return records
+
+
+def _ends_with_newline(path):
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def hydrate(movie_ids, checkpoint_path, workers=8, load=None):
+    """Fetch every id missing from the checkpoint.
+
+    Returns ``({movie_id: record}, number_of_failures)``; failed ids are not
+    checkpointed, so the next run retries them.
+    """
+    if load is None:
+        from cinematch.tmdb import load_details as load
+
+    records = read_checkpoint(checkpoint_path)
+    todo = [mid for mid in movie_ids if mid not in records]
+    failed = 0
+
+    def fetch(movie_id):
+        try:
+            return {"movie_id": movie_id, "status": "ok", "details": load(movie_id)}
+        except NotFound:
+            return {"movie_id": movie_id, "status": "not_found"}
+
+    with open(checkpoint_path, "a") as out, ThreadPoolExecutor(workers) as pool:
+        if out.tell() and not _ends_with_newline(checkpoint_path):
+            out.write("\n")  # end a torn line so the next record starts clean
+        futures = {pool.submit(fetch, mid): mid for mid in todo}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                record = future.result()
+            except Exception as exc:
+                failed += 1
+                print("movie {}: {}".format(futures[future], exc))
+                continue
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            records[record["movie_id"]] = record
+            if done % 250 == 0:
+                print("{}/{} fetched".format(done, len(todo)))
+    return records, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Hydrate the local TMDB catalog for every movie in the model"
+    )
+    parser.add_argument("movies_dir", help="directory holding the model")
+    parser.add_argument(
+        "--output", help="catalog directory (default: <movies_dir>/catalog)"
+    )
+    parser.add_argument(
+        "--checkpoint",
+        help="JSON-lines checkpoint (default: <movies_dir>/catalog.checkpoint.jsonl)",
+    )
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument(
+        "--rate", type=float, help="requests per second (default: client limit)"
+    )
+    args = parser.parse_args()
+
+    if args.rate:
+        from cinematch.tmdb_client import get_client
+
+        limiter = get_client().rate_limiter
+        limiter.rate = limiter.burst = args.rate
+
+    output = args.output or os.path.join(args.movies_dir, "catalog")
+    checkpoint = args.checkpoint or os.path.join(
+        args.movies_dir, "catalog.checkpoint.jsonl"
+    )
+    model = load_model(os.path.join(args.movies_dir, "model"))
+    movie_ids = list(dict.fromkeys(int(mid) for mid in model.movie_ids.tolist()))
+
+    start = time.perf_counter()
+    records, failed = hydrate(movie_ids, checkpoint, workers=args.workers)
+    write_catalog(output, movie_ids, records)
+    print(
+        "wrote {} ({} of {} movies, {} failed) in {:.1f}s".format(
+            output, len(records), len(movie_ids), failed, time.perf_counter() - start
+        )
+    )
+    if failed:
+        print("run again to retry the failed movies")
+
+
+if __name__ == "__main__":
+    main()
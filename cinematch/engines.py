@@ -0,0 +1,164 @@
+import os
+
+import numpy as np
+
+from cinematch.topk import top_k, top_k_rows
+
+ENGINE_ENV = "CINEMATCH_ENGINE"
+DEFAULT_ENGINE = "neighbors"
+BATCH_BLOCK_BYTES = 8 * 2**20
+# Neighbors per history item when an engine has no aggregate of its own.
+AGGREGATE_K = 50
+
+
+class DenseEngine:
+    """Fallback engine over the full N x N similarity matrix."""
+
+    def __init__(self, similarity):
+        self.similarity = similarity
+
+    def query(self, row, k):
+        return top_k(self.similarity[row], k, exclude=row)
+
+    def query_batch(self, rows, k):
+        similarity = self.similarity
+        return _chunked(
+            rows, k, len(similarity), lambda chunk: np.asarray(similarity[chunk])
+        )
+
+    def aggregate(self, rows, weights):
+        return np.asarray(weights, dtype=np.float32) @ self.similarity[rows]
+
+
+class NeighborEngine:
+    def __init__(self, index):
+        self.index = index
+
+    def query(self, row, k):
+        return self.index.query(row, k)
+
+    def query_batch(self, rows, k):
+        rows = np.asarray(rows, dtype=np.int64)
+        ids = np.asarray(self.index.ids[rows, :k], dtype=np.int64)
+        return ids, np.asarray(self.index.scores[rows, :k], dtype=np.float32)
+
+    def aggregate(self, rows, weights):
+        ids = self.index.ids[rows]
+        scores = self.index.scores[rows].astype(np.float32) * weights[:, None]
+        return _scatter(ids, scores, len(self.index.ids))
+
+
+class SparseEngine:
+    """Query-time cosine similarity from the L2-normalised sparse tag matrix.
+
+    Each query is one sparse matrix-vector product, so nothing N x N is ever
+    stored and memory stays linear in the catalog size.
+    """
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        # Feature-major copy: a query only touches the columns of the terms it
+        # contains instead of scanning every row.
+        self.by_feature = vectors.T.tocsr()
+
+    def query(self, row, k):
+        start, stop = self.vectors.indptr[row], self.vectors.indptr[row + 1]
+        features = self.vectors.indices[start:stop]
+        weights = self.vectors.data[start:stop]
+        scores = self.by_feature[features].T @ weights
+        return top_k(scores, k, exclude=row)
+
+    def query_batch(self, rows, k):
+        # Sparse x dense with the chunk's query rows densified is cheaper
+        # than a sparse x sparse product whose result is mostly filled in.
+        vectors = self.vectors
+        return _chunked(
+            rows,
+            k,
+            vectors.shape[0],
+            lambda chunk: (vectors @ vectors[chunk].toarray().T).T.copy(),
+        )
+
+    def aggregate(self, rows, weights):
+        # Rows are unit length, so scoring the weighted sum of the history
+        # vectors is the weighted sum of their cosine rows.
+        profile = self.vectors[rows].T @ np.asarray(weights, dtype=np.float32)
+        return self.vectors @ profile
+
+
+def _chunked(rows, k, n, score):
+    """Row-wise top ``k`` of ``score(chunk)`` for ``rows``, a chunk at a time.
+
+    Each chunk is one matrix product against all ``n`` movies, sized so the
+    dense score block stays under BATCH_BLOCK_BYTES and in cache. ``score``
+    must return a fresh array, since the seeds are masked out in place.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    k = max(min(k, n - 1), 0)
+    size = max(1, BATCH_BLOCK_BYTES // (4 * max(n, 1)))
+    ids, scores = [], []
+    for start in range(0, len(rows), size):
+        chunk = rows[start : start + size]
+        block = score(chunk)
+        block[np.arange(len(chunk)), chunk] = -np.inf
+        block_ids, block_scores = top_k_rows(block, k)
+        ids.append(block_ids)
+        scores.append(block_scores.astype(np.float32))
+    if not ids:
+        return np.empty((0, k), dtype=np.int64), np.empty((0, k), dtype=np.float32)
+    return np.vstack(ids), np.vstack(scores)
+
+
+def query_batch(engine, rows, k):
+    """Top ``k`` for every row; engines without a batch path go one by one."""
+    if hasattr(engine, "query_batch"):
+        return engine.query_batch(rows, k)
+    results = [engine.query(int(row), k) for row in rows]
+    if not results:
+        return np.empty((0, 0), dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+    width = min(len(ids) for ids, _ in results)
+    ids = np.vstack([ids[:width] for ids, _ in results])
+    scores = np.vstack([scores[:width] for _, scores in results])
+    return ids, scores.astype(np.float32)
+
+
+def aggregate(engine, rows, weights, n):
+    """Weighted sum of the similarity rows of ``rows``, as ``n`` scores.
+
+    Engines without a full-row aggregate sum the rows' neighbor lists.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    weights = np.asarray(weights, dtype=np.float32)
+    if hasattr(engine, "aggregate"):
+        return np.asarray(engine.aggregate(rows, weights), dtype=np.float32)
+    ids, scores = query_batch(engine, rows, AGGREGATE_K)
+    return _scatter(ids, scores * weights[:, None], n)
+
+
+def _scatter(ids, scores, n):
+    valid = ids >= 0
+    return np.bincount(ids[valid], weights=scores[valid], minlength=n).astype(
+        np.float32
+    )
+
+
+def engine_mode(mode=None):
+    return mode or os.environ.get(ENGINE_ENV, DEFAULT_ENGINE)
+
+
+def load_engine(model, mode=None):
+    """Return the engine selected by ``mode`` or the CINEMATCH_ENGINE variable."""
+    mode = engine_mode(mode)
+    if mode == "neighbors":
+        return NeighborEngine(model.neighbors)
+    if mode == "sparse":
+        return SparseEngine(model.vectors)
+    if mode == "dense":
+        if model.similarity is None:
+            raise ValueError("model was built without the dense similarity matrix")
+        return DenseEngine(model.similarity)
+    if mode == "ann":
+        from cinematch.ann import open_ivf
+
+        return open_ivf(model)
+    raise ValueError("unknown recommendation engine: {}".format(mode))
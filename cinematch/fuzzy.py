@@ -0,0 +1,90 @@
+"""Fuzzy title search over a character-trigram inverted index.
+
+Candidates are the titles sharing the most trigrams with the query; only
+those are reranked with the same ``SequenceMatcher`` ratio that
+``difflib.get_close_matches`` uses, so results follow the old cutoff
+behaviour without comparing the query against every title.
+"""
+import difflib
+from collections import defaultdict
+
+import numpy as np
+
+DEFAULT_CUTOFF = 0.3
+CANDIDATES = 12
+
+
+def normalize(text):
+    return " ".join(str(text).lower().split())
+
+
+def trigrams(text):
+    padded = "  " + text + " "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzyTitleIndex:
+    def __init__(self, titles, candidates=CANDIDATES):
+        self.titles = list(titles)
+        self.candidates = candidates
+        self.normalized = [normalize(t) for t in self.titles]
+        self.exact = {}
+        postings = defaultdict(list)
+        for row, title in enumerate(self.normalized):
+            self.exact.setdefault(title, row)
+            for gram in trigrams(title):
+                postings[gram].append(row)
+        self.postings = {
+            gram: np.asarray(rows, dtype=np.int32) for gram, rows in postings.items()
+        }
+        self.gram_counts = np.asarray(
+            [len(trigrams(t)) for t in self.normalized], dtype=np.float32
+        )
+
+    def search(self, query, n=5, cutoff=DEFAULT_CUTOFF):
+        """Up to ``n`` ``(row, score)`` pairs, best first, with score >= cutoff."""
+        query = normalize(query)
+        if not query:
+            return []
+        exact = self.exact.get(query)
+
+        grams = trigrams(query)
+        lists = [self.postings[g] for g in grams if g in self.postings]
+        rows = []
+        if lists:
+            overlap = np.bincount(np.concatenate(lists))
+            # Only titles sharing at least half the best overlap can rank well.
+            touched = np.flatnonzero(overlap >= (overlap.max() + 1) // 2)
+            # Dice coefficient on trigram sets picks the rerank candidates.
+            dice = 2 * overlap[touched] / (self.gram_counts[touched] + len(grams))
+            if len(touched) > self.candidates:
+                keep = np.argpartition(-dice, self.candidates)[: self.candidates]
+                touched, dice = touched[keep], dice[keep]
+            # Best first, so the rerank bound below rises as early as it can.
+            rows = touched[np.argsort(-dice, kind="stable")].tolist()
+        if exact is not None and exact not in rows:
+            rows.append(exact)
+
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(query)
+        scored = []
+        floor = cutoff
+        for row in rows:
+            matcher.set_seq1(self.normalized[row])
+            # Both quick ratios bound ratio() from above, so titles that
+            # cannot reach the n-th best score so far are never matched.
+            if matcher.real_quick_ratio() >= floor and matcher.quick_ratio() >= floor:
+                score = matcher.ratio()
+                if score >= floor:
+                    scored.append((score, -row))
+                    if len(scored) >= n:
+                        scored.sort(reverse=True)
+                        del scored[n:]
+                        floor = scored[-1][0]
+        scored.sort(reverse=True)
+        return [(-neg_row, score) for score, neg_row in scored[:n]]
+
+    def best(self, query, cutoff=DEFAULT_CUTOFF):
+        """Row of the closest title, or None when nothing passes the cutoff."""
+        matches = self.search(query, n=1, cutoff=cutoff)
+        return matches[0][0] if matches else None
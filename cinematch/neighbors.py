@@ -0,0 +1,87 @@
+import numpy as np
+
+from cinematch.topk import top_k_rows
+
+DEFAULT_K = 50
+# Size of the dense float32 similarity block a worker scores at once.
+BLOCK_BYTES = 32 * 2**20
+
+
+class NeighborIndex:
+    """The K most similar rows for every movie, best first.
+
+    ``ids`` holds row positions (int32) and ``scores`` the cosine similarity
+    (float16), both shaped (n_movies, K).
+    """
+
+    def __init__(self, ids, scores):
+        self.ids = ids
+        self.scores = scores
+
+    @property
+    def k(self):
+        return self.ids.shape[1]
+
+    def __len__(self):
+        return self.ids.shape[0]
+
+    def query(self, row, k):
+        ids = np.asarray(self.ids[row, :k], dtype=np.int64)
+        return ids, np.asarray(self.scores[row, :k], dtype=np.float32)
+
+
+def chunk_rows(n, block_bytes=BLOCK_BYTES):
+    """Rows per chunk that keep a float32 (rows, n) block under ``block_bytes``."""
+    return max(1, block_bytes // (4 * max(n, 1)))
+
+
+_shared = {}
+
+
+def _share(vectors, transposed):
+    _shared["vectors"] = vectors
+    _shared["transposed"] = transposed
+
+
+def _chunk_neighbors(start, stop, k, vectors=None, transposed=None):
+    if vectors is None:
+        vectors, transposed = _shared["vectors"], _shared["transposed"]
+    block = vectors[start:stop] @ transposed
+    if hasattr(block, "toarray"):
+        block = block.toarray()
+    # A fresh block, so the movies themselves are masked out in place.
+    return top_k_rows(block, k, exclude=np.arange(start, stop))
+
+
+def build_neighbor_index(vectors, k=DEFAULT_K, block_bytes=BLOCK_BYTES, workers=1):
+    """Build the index from L2-normalised row vectors, one chunk at a time.
+
+    Chunks hold as many rows as fit a ``block_bytes`` block of similarities
+    against every movie, so each worker's scratch memory stays about the
+    same whatever the catalog size. With ``workers > 1`` the chunks are
+    scored in a process pool that receives the vectors once.
+    """
+    n = vectors.shape[0]
+    k = min(k, n - 1)
+    ids = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float16)
+    transposed = vectors.T.tocsc() if hasattr(vectors, "tocsc") else vectors.T
+    chunk_size = chunk_rows(n, block_bytes)
+    bounds = [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+    if workers > 1 and len(bounds) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_share, initargs=(vectors, transposed)
+        ) as pool:
+            starts, stops = zip(*bounds)
+            results = pool.map(_chunk_neighbors, starts, stops, [k] * len(bounds))
+            for (start, stop), (rows, vals) in zip(bounds, results):
+                ids[start:stop] = rows
+                scores[start:stop] = vals
+    else:
+        for start, stop in bounds:
+            rows, vals = _chunk_neighbors(start, stop, k, vectors, transposed)
+            ids[start:stop] = rows
+            scores[start:stop] = vals
+    return NeighborIndex(ids, scores)
@@ -0,0 +1,246 @@
+"""Rendered-page cache for the Flask app.
+
+Pages are cached as encoded bytes under a key made of the route, its
+normalized arguments and the model version, so a new model never serves an
+old page. The cache is bounded by the total size of the stored pages and
+evicts the least recently used ones first. Concurrent misses for the same
+key share one render; a streamed render runs in a thread of its own, so it
+is finished and cached even when its client goes away, and every request
+for the page reads the chunks as they are produced. Entries expire after
+``ttl`` seconds because the TMDB details baked into a page can change, and
+after ``degraded_ttl`` seconds when the render had to fall back to local
+data for some of them.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+MAX_BYTES_ENV = "CINEMATCH_PAGE_CACHE_MB"
+DEFAULT_MAX_BYTES = 64 * 2**20
+DEFAULT_TTL = 600
+# Long enough to absorb a burst, short enough that the next visitor gets
+# the details the slow lookups have cached by then.
+DEFAULT_DEGRADED_TTL = 5
+# Seconds a request waits for someone else's render before rendering the
+# page itself (uncached); TMDB lookups give up well before that.
+DEFAULT_WAIT_TIMEOUT = 10
+
+
+class _Render:
+    """The chunks of a page being rendered, readable while it is produced."""
+
+    def __init__(self):
+        self.parts = []
+        self.done = False
+        self.body = None
+        self.error = None
+        self._cond = threading.Condition()
+
+    def append(self, chunk):
+        with self._cond:
+            self.parts.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, body=None, error=None):
+        with self._cond:
+            self.done = True
+            self.body = body
+            self.error = error
+            self._cond.notify_all()
+
+    def result(self, timeout):
+        """The page as bytes, or None if it is not done within ``timeout``."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.done, timeout):
+                return None
+        if self.error is not None:
+            raise self.error
+        return self.body
+
+    def first(self, timeout):
+        """Whether a chunk (or the end) arrived within ``timeout`` seconds."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.parts or self.done, timeout)
+
+    def follow(self):
+        """Yield the chunks from the first one on, as they come."""
+        sent = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self.parts) > sent or self.done)
+                parts = self.parts[sent:]
+                done = self.done
+            sent += len(parts)
+            yield from parts
+            if done:
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+class PageCache:
+    def __init__(
+        self,
+        max_bytes=DEFAULT_MAX_BYTES,
+        ttl=DEFAULT_TTL,
+        wait_timeout=DEFAULT_WAIT_TIMEOUT,
+        degraded_ttl=DEFAULT_DEGRADED_TTL,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.degraded_ttl = degraded_ttl
+        self.wait_timeout = wait_timeout
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._counters = dict.fromkeys(
+            (
+                "hits",
+                "misses",
+                "coalesced",
+                "timeouts",
+                "degraded",
+                "evictions",
+                "purged",
+                "errors",
+            ),
+            0,
+        )
+
+    def _claim(self, key):
+        """``(body, None, False)`` on a hit, else ``(None, render, owner)``."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                body, expires = item
+                if time.time() <= expires:
+                    self._data.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return body, None, False
+                self._remove(key)
+            state = self._inflight.get(key)
+            owner = state is None
+            if owner:
+                self._counters["misses"] += 1
+                state = self._inflight[key] = _Render()
+            else:
+                self._counters["coalesced"] += 1
+            return None, state, owner
+
+    def _finish(self, key, state, body=None, error=None, degraded=False):
+        with self._lock:
+            if error is not None:
+                self._counters["errors"] += 1
+            elif degraded:
+                self._counters["degraded"] += 1
+                self._put(key, body, self.degraded_ttl)
+            else:
+                self._put(key, body, self.ttl)
+            del self._inflight[key]
+        state.finish(body, error)
+
+    def _timed_out(self):
+        with self._lock:
+            self._counters["timeouts"] += 1
+
+    def get(self, key, render, fallbacks=None):
+        """The page for ``key``, calling ``render()`` (returning str) on a miss.
+
+        ``fallbacks``, when given, returns a running count of the parts the
+        calling thread rendered from fallback data; a render that raises it
+        is cached for ``degraded_ttl`` seconds only.
+        """
+        body, state, owner = self._claim(key)
+        if body is not None:
+            return body
+        if not owner:
+            body = state.result(self.wait_timeout)
+            if body is not None:
+                return body
+            self._timed_out()
+            return render().encode("utf-8")
+
+        before = fallbacks() if fallbacks else 0
+        try:
+            page = render()
+        except BaseException as exc:
+            self._finish(key, state, error=exc)
+            raise
+        state.append(page)
+        body = page.encode("utf-8")
+        degraded = fallbacks is not None and fallbacks() > before
+        self._finish(key, state, body, degraded=degraded)
+        return body
+
+    def stream(self, key, render, wrap=None, fallbacks=None):
+        """Like get, but a miss returns an iterator of the page's chunks.
+
+        ``render()`` returns an iterable of str. It is consumed by a thread
+        of its own, whose target is passed through ``wrap`` first when given
+        (to carry a request context, say), and the page is cached once the
+        last chunk is out. Requests that arrive meanwhile read the same
+        chunks; if the first one takes longer than ``wait_timeout`` they
+        render the page themselves. ``fallbacks`` is as for get and is read
+        in the rendering thread.
+        """
+        body, state, owner = self._claim(key)
+        if body is not None:
+            return body
+        if owner:
+            produce = self._producer(key, state, render, fallbacks)
+            thread = threading.Thread(target=wrap(produce) if wrap else produce)
+            thread.daemon = True
+            thread.start()
+        elif not state.first(self.wait_timeout):
+            self._timed_out()
+            return render()
+        return state.follow()
+
+    def _producer(self, key, state, render, fallbacks):
+        def produce():
+            before = fallbacks() if fallbacks else 0
+            try:
+                for chunk in render():
+                    state.append(chunk)
+            except BaseException as exc:
+                self._finish(key, state, error=exc)
+                return
+            body = "".join(state.parts).encode("utf-8")
+            degraded = fallbacks is not None and fallbacks() > before
+            self._finish(key, state, body, degraded=degraded)
+
+        return produce
+
+    def _put(self, key, body, ttl):
+        if key in self._data:
+            self._remove(key)
+        if len(body) > self.max_bytes:
+            return
+        self._data[key] = (body, time.time() + ttl)
+        self._bytes += len(body)
+        while self._bytes > self.max_bytes:
+            _, (evicted, _) = self._data.popitem(last=False)
+            self._bytes -= len(evicted)
+            self._counters["evictions"] += 1
+
+    def _remove(self, key):
+        body, _ = self._data.pop(key)
+        self._bytes -= len(body)
+
+    def purge(self, route=None):
+        """Drop every page, or only those of ``route``; returns the count."""
+        with self._lock:
+            keys = [key for key in self._data if route is None or key[0] == route]
+            for key in keys:
+                self._remove(key)
+            self._counters["purged"] += len(keys)
+            return len(keys)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["pages"] = len(self._data)
+            stats["bytes"] = self._bytes
+        stats["max_bytes"] = self.max_bytes
+        return stats
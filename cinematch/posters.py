@@ -0,0 +1,277 @@
+"""Local poster proxy with an on-disk image cache.
+
+Each poster is downloaded from the TMDB image host once, at the largest
+width the pages use, and the smaller widths are made from that copy with
+Pillow (or downloaded as TMDB's own variants when Pillow is missing). Images
+are stored content-addressed under ``blobs/`` with a SQLite index mapping
+``<movie id>/<size>`` to a digest; the least recently used entries are
+evicted once the blobs pass ``max_bytes``. Concurrent misses for the same
+poster share one fetch.
+"""
+import hashlib
+import io
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+import requests
+
+from cinematch.cache import NotFound, SingleFlight
+from cinematch.tmdb import fetch_poster_path
+from cinematch.tmdb_client import TMDBError, get_client
+
+IMAGE_BASE_ENV = "TMDB_IMAGE_URL"
+DEFAULT_IMAGE_BASE = "https://image.tmdb.org/t/p"
+CACHE_DIR_ENV = "CINEMATCH_POSTER_CACHE"
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "Movies",
+    "cache",
+    "posters",
+)
+MAX_BYTES_ENV = "CINEMATCH_POSTER_CACHE_MB"
+DEFAULT_MAX_BYTES = 256 * 2**20
+
+# TMDB poster widths; the others are resized from SOURCE_SIZE.
+SIZES = {"w92": 92, "w154": 154, "w185": 185, "w342": 342, "w500": 500}
+SOURCE_SIZE = "w500"
+JPEG_QUALITY = 85
+# Seconds between last-used updates of an entry, to spare the index writes.
+TOUCH_INTERVAL = 60
+
+Poster = namedtuple("Poster", "digest content_type size path")
+
+
+def read_poster(poster):
+    with open(poster.path, "rb") as f:
+        return f.read()
+
+
+def resize(data, width):
+    """JPEG of ``data`` scaled down to ``width`` pixels, or None without Pillow.
+
+    Images that are not wider than ``width`` come back unchanged.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    with Image.open(io.BytesIO(data)) as source:
+        if source.width <= width:
+            return data
+        height = max(1, round(source.height * width / source.width))
+        image = source.convert("RGB").resize((width, height), Image.LANCZOS)
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+class PosterStore:
+    """Content-addressed image files with a SQLite index, bounded in bytes."""
+
+    def __init__(self, root, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(root, "index.sqlite"), timeout=10, check_same_thread=False
+        )
+        self.evictions = 0
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS posters ("
+                "key TEXT PRIMARY KEY, digest TEXT, content_type TEXT, "
+                "size INTEGER, used REAL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS posters_used ON posters (used)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS posters_digest ON posters (digest)"
+            )
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, "blobs", digest[:2], digest)
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest, content_type, size, used FROM posters WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            digest, content_type, size, used = row
+            path = self.blob_path(digest)
+            with self._conn:
+                if not os.path.exists(path):
+                    # Removed behind the index's back; fetch it again.
+                    self._conn.execute("DELETE FROM posters WHERE key = ?", (key,))
+                    return None
+                now = time.time()
+                if now - used > TOUCH_INTERVAL:
+                    self._conn.execute(
+                        "UPDATE posters SET used = ? WHERE key = ?", (now, key)
+                    )
+        return Poster(digest, content_type, size, path)
+
+    def put(self, key, data, content_type):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(digest)
+        if not os.path.exists(path):
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory)
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO posters VALUES (?, ?, ?, ?, ?)",
+                (key, digest, content_type, len(data), time.time()),
+            )
+            self._evict(keep=key)
+        return Poster(digest, content_type, len(data), path)
+
+    def _total_bytes(self):
+        return self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM "
+            "(SELECT MAX(size) AS size FROM posters GROUP BY digest)"
+        ).fetchone()[0]
+
+    def _evict(self, keep):
+        total = self._total_bytes()
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT key, digest, size FROM posters WHERE key != ? ORDER BY used",
+            (keep,),
+        ).fetchall()
+        for key, digest, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM posters WHERE key = ?", (key,))
+            self.evictions += 1
+            shared = self._conn.execute(
+                "SELECT 1 FROM posters WHERE digest = ? LIMIT 1", (digest,)
+            ).fetchone()
+            if shared is None:
+                try:
+                    os.remove(self.blob_path(digest))
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM posters").fetchone()[0]
+            total = self._total_bytes()
+        return {
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+
+class PosterProxy:
+    def __init__(self, store, base_url=None, poster_path=fetch_poster_path):
+        self.store = store
+        base_url = base_url or os.environ.get(IMAGE_BASE_ENV, DEFAULT_IMAGE_BASE)
+        self.base_url = base_url.rstrip("/")
+        self.poster_path = poster_path
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+        self._counters = dict.fromkeys(
+            ("hits", "misses", "coalesced", "downloads", "resized", "errors"), 0
+        )
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def get(self, movie_id, size):
+        """The cached Poster of a movie at ``size``, fetching it on a miss.
+
+        Returns None when the movie has no poster. ``size`` must be one of
+        SIZES.
+        """
+        key = "{}/{}".format(int(movie_id), size)
+        poster = self.store.get(key)
+        if poster is not None:
+            self._count("hits")
+            return poster
+        self._count("misses")
+        future, owner = self._flights.run(key, lambda: self._fetch(movie_id, size))
+        if not owner:
+            self._count("coalesced")
+        elif future.exception() is not None:
+            self._count("errors")
+        return future.result()
+
+    def _fetch(self, movie_id, size):
+        try:
+            path = self.poster_path(movie_id)
+            if not path:
+                return None
+            key = "{}/{}".format(int(movie_id), size)
+            if size == SOURCE_SIZE:
+                return self.store.put(key, *self._download(SOURCE_SIZE, path))
+            source = self.get(movie_id, SOURCE_SIZE)
+            if source is None:
+                return None
+            original = read_poster(source)
+            data = resize(original, SIZES[size])
+            if data is None:
+                return self.store.put(key, *self._download(size, path))
+        except NotFound:
+            return None
+        self._count("resized")
+        content_type = source.content_type if data is original else "image/jpeg"
+        return self.store.put(key, data, content_type)
+
+    def _download(self, size, path):
+        client = get_client()
+        url = "{}/{}/{}".format(self.base_url, size, path.lstrip("/"))
+        self._count("downloads")
+        try:
+            response = client.session.get(url, timeout=client.timeout)
+        except requests.RequestException as exc:
+            raise TMDBError(str(exc)) from exc
+        if response.status_code == 404:
+            raise NotFound(url)
+        if not response.ok:
+            raise TMDBError(
+                "image host returned {} for {}".format(response.status_code, url)
+            )
+        content_type = response.headers.get("Content-Type", "image/jpeg")
+        return response.content, content_type.split(";", 1)[0]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats.update(self.store.stats())
+        return stats
+
+
+_proxy = None
+_proxy_lock = threading.Lock()
+
+
+def get_proxy():
+    """Process-wide poster proxy over CINEMATCH_POSTER_CACHE."""
+    global _proxy
+    with _proxy_lock:
+        if _proxy is None:
+            max_bytes = int(os.environ.get(MAX_BYTES_ENV, 0)) * 2**20
+            store = PosterStore(
+                os.environ.get(CACHE_DIR_ENV, DEFAULT_CACHE_DIR),
+                max_bytes=max_bytes or DEFAULT_MAX_BYTES,
+            )
+            _proxy = PosterProxy(store)
+        return _proxy
@@ -0,0 +1,192 @@
+import numpy as np
+
+from cinematch.engines import aggregate, query_batch
+from cinematch.tmdb import fetch_many_details, iter_many_details
+from cinematch.topk import top_k
+
+OVERVIEW_LIMIT = 180
+# Weight of each older history item relative to the one viewed after it.
+RECENCY_DECAY = 0.8
+
+
+class MovieIndex:
+    """O(1) title -> row and movie_id -> row lookups, built once at load time.
+
+    The catalog has a few duplicate titles and ids. The first row wins,
+    which is the row the old ``movies[movies["title"] == title].index[0]``
+    scans returned.
+    """
+
+    def __init__(self, movie_ids, titles):
+        self.movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        self.titles = list(titles)
+        self.title_to_row = {}
+        for row, title in enumerate(self.titles):
+            self.title_to_row.setdefault(title, row)
+        self.id_to_row = {}
+        for row, movie_id in enumerate(self.movie_ids.tolist()):
+            self.id_to_row.setdefault(movie_id, row)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def row_for_title(self, title):
+        try:
+            return self.title_to_row[title]
+        except KeyError:
+            raise ValueError("unknown movie title: {}".format(title)) from None
+
+    def row_for_id(self, movie_id):
+        try:
+            return self.id_to_row[int(movie_id)]
+        except KeyError:
+            raise ValueError("unknown movie id: {}".format(movie_id)) from None
+
+
+class CardStream:
+    """Recommendation cards that arrive one by one as their details resolve.
+
+    The lookups start when the stream is created. Iterating yields cards in
+    rank order, each as soon as its details are in, so a streamed template
+    can send a card without waiting for the slowest one. ``len()`` and
+    truth are known up front for the template's ``{% if %}`` checks.
+    """
+
+    def __init__(self, index, rows, scores):
+        self.movie_ids = [int(index.movie_ids[r]) for r in rows]
+        self.titles = [index.titles[r] for r in rows]
+        self.scores = [float(score) for score in scores]
+        self._details = iter_many_details(self.movie_ids, self.titles)
+
+    def __len__(self):
+        return len(self.movie_ids)
+
+    def __iter__(self):
+        for movie_id, title, score, details in zip(
+            self.movie_ids, self.titles, self.scores, self._details
+        ):
+            yield card(movie_id, title, score, details)
+
+
+def card(movie_id, title, score, details):
+    overview = details["overview"]
+    if len(overview) > OVERVIEW_LIMIT:
+        overview = overview[:OVERVIEW_LIMIT] + "..."
+    return {
+        "movie_id": movie_id,
+        "title": details["title"] or title,
+        "year": details["year"],
+        "poster": details["poster"],
+        "rating": details["rating"],
+        "similarity": float(score),
+        "overview": overview,
+    }
+
+
+class Recommender:
+    def __init__(self, index, engine):
+        self.index = index
+        self.engine = engine
+
+    def similar_rows(self, row, top_n):
+        return self.engine.query(row, top_n)
+
+    def recommend(self, movie_title, top_n=6, stream=False):
+        row = self.index.row_for_title(movie_title)
+        return self.recommend_row(row, top_n, stream=stream)
+
+    def recommend_by_id(self, movie_id, top_n=6, stream=False):
+        row = self.index.row_for_id(movie_id)
+        return self.recommend_row(row, top_n, stream=stream)
+
+    def recommend_row(self, row, top_n=6, stream=False):
+        """Cards for the movies most similar to ``row``.
+
+        With ``stream`` the cards come back as a CardStream instead of a
+        list, so details are still being looked up when this returns.
+        """
+        rows, scores = self.similar_rows(row, top_n)
+        if stream:
+            return CardStream(self.index, rows, scores)
+        return self.cards(rows, scores)
+
+    def similar_to_history(self, movie_ids, top_n=8, decay=RECENCY_DECAY):
+        """Rows and scores of the movies most similar to a viewing history.
+
+        ``movie_ids`` is most recent first; item ``i`` weighs ``decay ** i``.
+        The history's similarity rows are summed with those weights in one
+        aggregate, seen movies are dropped and the best ``top_n`` returned.
+        """
+        rows = [self.index.id_to_row.get(int(m)) for m in movie_ids]
+        rows = np.asarray([r for r in rows if r is not None], dtype=np.int64)
+        if not rows.size:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        weights = decay ** np.arange(len(rows), dtype=np.float32)
+        scores = aggregate(self.engine, rows, weights, len(self.index))
+        scores[rows] = -np.inf
+        best, best_scores = top_k(scores, top_n)
+        keep = best_scores > 0
+        return best[keep], best_scores[keep]
+
+    def recommend_for_history(self, movie_ids, top_n=8, decay=RECENCY_DECAY):
+        rows, scores = self.similar_to_history(movie_ids, top_n, decay)
+        return self.cards(rows, scores)
+
+    def recommend_batch(self, seeds, top_n=10, details=False):
+        """The ``top_n`` most similar movie ids and scores for every seed.
+
+        Seeds are movie ids (int) or titles (str) and are scored together.
+        Unknown seeds get an ``error`` instead of ``results``. TMDB details
+        are only looked up when ``details`` is true, in one fan-out for the
+        whole batch on the batch pool, so pages keep their own workers.
+        """
+        out = [None] * len(seeds)
+        slots, rows = [], []
+        for slot, seed in enumerate(seeds):
+            try:
+                if isinstance(seed, str):
+                    row = self.index.row_for_title(seed)
+                else:
+                    row = self.index.row_for_id(seed)
+            except (TypeError, ValueError) as exc:
+                out[slot] = {"seed": seed, "error": str(exc)}
+                continue
+            slots.append(slot)
+            rows.append(row)
+
+        rows = np.asarray(rows, dtype=np.int64)
+        ids, scores = query_batch(self.engine, rows, top_n)
+        movie_ids = self.index.movie_ids
+        # Convert whole blocks to Python lists once rather than per element.
+        seed_ids = movie_ids[rows].tolist()
+        for slot, seed_id, neighbor_ids, neighbor_scores in zip(
+            slots, seed_ids, movie_ids[ids].tolist(), scores.tolist()
+        ):
+            out[slot] = {
+                "seed": seeds[slot],
+                "movie_id": seed_id,
+                "results": [
+                    {"movie_id": movie_id, "score": score}
+                    for movie_id, score in zip(neighbor_ids, neighbor_scores)
+                ],
+            }
+        if details:
+            self._attach_details([entry for entry in out if "results" in entry])
+        return out
+
+    def _attach_details(self, entries):
+        wanted = {}
+        for entry in entries:
+            for result in entry["results"]:
+                wanted.setdefault(result["movie_id"], None)
+        movie_ids = list(wanted)
+        titles = [self.index.titles[self.index.id_to_row[m]] for m in movie_ids]
+        details = fetch_many_details(movie_ids, titles, batch=True)
+        found = dict(zip(movie_ids, details))
+        for entry in entries:
+            for result in entry["results"]:
+                result["details"] = found[result["movie_id"]]
+
+    def cards(self, rows, scores):
+        """Recommendation cards for ``rows`` with TMDB details filled in."""
+        return list(CardStream(self.index, rows, scores))
@@ -0,0 +1,130 @@
+"""BM25 keyword search over the ``tags`` column.
+
+Tags already hold stemmed overview words, genres, keywords, the top cast and
+the director. The inverted index stores, per term, a slice of row ids (int32)
+and term frequencies (uint16) in flat CSR-style arrays.
+"""
+import re
+from collections import Counter
+
+import numpy as np
+
+from cinematch.topk import top_k
+
+TOKEN = re.compile(r"[a-z0-9]+")
+K1 = 1.2
+B = 0.75
+MIN_PREFIX = 3
+
+
+def tokenize(text):
+    return TOKEN.findall(str(text).lower())
+
+
+def _stemmer():
+    try:
+        from nltk.stem.porter import PorterStemmer
+    except ImportError:
+        return None
+    return PorterStemmer().stem
+
+
+class SearchIndex:
+    def __init__(self, tags):
+        self.vocabulary = {}
+        term_ids, rows, tfs, lengths = [], [], [], []
+        for row, text in enumerate(tags):
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                term_ids.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                rows.append(row)
+                tfs.append(tf)
+
+        self.n_docs = len(lengths)
+        self.terms = list(self.vocabulary)
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        # Stable sort keeps each posting list in row order.
+        order = np.argsort(term_ids, kind="stable")
+        self.doc_ids = np.asarray(rows, dtype=np.int32)[order]
+        tfs = np.asarray(tfs, dtype=np.int64)[order]
+        self.tfs = np.minimum(tfs, 65535).astype(np.uint16)
+        self.indptr = np.zeros(len(self.terms) + 1, dtype=np.int64)
+        counts = np.bincount(term_ids, minlength=len(self.terms))
+        np.cumsum(counts, out=self.indptr[1:])
+
+        self.doc_lengths = np.asarray(lengths, dtype=np.float32)
+        avgdl = float(self.doc_lengths.mean()) if self.n_docs else 1.0
+        self.length_norm = K1 * (1 - B + B * self.doc_lengths / max(avgdl, 1.0))
+        df = np.diff(self.indptr).astype(np.float32)
+        self.idf = np.log1p((self.n_docs - df + 0.5) / (df + 0.5))
+        self._stem = None
+
+    @property
+    def stem(self):
+        # nltk is only imported once a query word misses the vocabulary.
+        if self._stem is None:
+            self._stem = _stemmer() or False
+        return self._stem or None
+
+    def resolve(self, word):
+        """Vocabulary id for a query word, or None.
+
+        Tries the word itself, its Porter stem when nltk is installed, then
+        the longest indexed term it starts with (``"marine"`` -> ``"marin"``).
+        """
+        word = word.lower()
+        if word in self.vocabulary:
+            return self.vocabulary[word]
+        if self.stem is not None:
+            stemmed = self.stem(word)
+            if stemmed in self.vocabulary:
+                return self.vocabulary[stemmed]
+        for end in range(len(word) - 1, MIN_PREFIX - 1, -1):
+            term_id = self.vocabulary.get(word[:end])
+            if term_id is not None:
+                return term_id
+        return None
+
+    def parse(self, query, op="and"):
+        """Split a query into term ids; a bare ``OR``/``AND`` sets the operator."""
+        words = str(query).split()
+        if "OR" in words:
+            op = "or"
+        elif "AND" in words:
+            op = "and"
+        terms = []
+        missing = []
+        for word in words:
+            if word in ("AND", "OR"):
+                continue
+            for token in tokenize(word):
+                term_id = self.resolve(token)
+                if term_id is None:
+                    missing.append(token)
+                elif term_id not in terms:
+                    terms.append(term_id)
+        return terms, missing, op
+
+    def search(self, query, n=20, op="and"):
+        """Return ``(rows, scores)`` of the best ``n`` matches, best first."""
+        terms, missing, op = self.parse(query, op)
+        empty = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if not terms or (op == "and" and missing):
+            return empty
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        matched = np.zeros(self.n_docs, dtype=np.int16)
+        for term_id in terms:
+            start, stop = self.indptr[term_id], self.indptr[term_id + 1]
+            docs = self.doc_ids[start:stop]
+            tf = self.tfs[start:stop].astype(np.float32)
+            scores[docs] += (
+                self.idf[term_id] * tf * (K1 + 1) / (tf + self.length_norm[docs])
+            )
+            matched[docs] += 1
+        need = len(terms) if op == "and" else 1
+        candidates = np.flatnonzero(matched >= need)
+        if candidates.size == 0:
+            return empty
+        best, best_scores = top_k(scores[candidates], n)
+        return candidates[best], best_scores
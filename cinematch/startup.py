@@ -0,0 +1,37 @@
+"""Wall-clock timing of the phases an app goes through before serving.
+
+    startup = StartupProfile()
+    with startup.phase("import flask"):
+        import flask
+    print(startup.report())
+"""
+import time
+from contextlib import contextmanager
+
+PROFILE_FLAG = "--startup-profile"
+
+
+class StartupProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def report(self):
+        width = max([len(name) for name, _ in self.phases] + [5])
+        lines = [
+            "{:<{}} {:>10.1f} ms".format(name, width, seconds * 1e3)
+            for name, seconds in self.phases
+        ]
+        lines.append("{:<{}} {:>10.1f} ms".format("total", width, self.total() * 1e3))
+        return "\n".join(lines)
@@ -0,0 +1,65 @@
+"""Typeahead over titles with a sorted prefix index.
+
+Every title is indexed under its full normalised form and under each word
+suffix ("the dark knight", "dark knight", "knight"), so both "the da" and
+"knig" find it. Each key stores the rank of its title for that match, so a
+lookup is two binary searches and a selection of the best ranks in the
+range, however many titles share a short prefix.
+"""
+from bisect import bisect_left
+
+import numpy as np
+
+from cinematch.fuzzy import normalize
+
+DEFAULT_LIMIT = 8
+
+
+class PrefixIndex:
+    def __init__(self, titles):
+        self.titles = list(titles)
+        n = len(self.titles)
+        # Shorter titles first, then alphabetical.
+        order = sorted(
+            range(n), key=lambda row: (len(self.titles[row]), self.titles[row])
+        )
+        self.rows_by_rank = np.asarray(order, dtype=np.int64)
+        rank_of = np.empty(n, dtype=np.int64)
+        rank_of[self.rows_by_rank] = np.arange(n)
+        entries = []
+        for row, title in enumerate(self.titles):
+            words = normalize(title).split(" ")
+            for position in range(len(words)):
+                entries.append((" ".join(words[position:]), position, row))
+        entries.sort()
+        self.keys = [key for key, _, _ in entries]
+        # Word matches rank after every whole-title match.
+        self.ranks = np.asarray(
+            [rank_of[row] + (n if position else 0) for _, position, row in entries],
+            dtype=np.int64,
+        )
+
+    def suggest(self, query, limit=DEFAULT_LIMIT):
+        """Rows of titles starting with ``query`` (or with a word that does).
+
+        Whole-title prefix matches rank above word matches; then shorter
+        titles first, then alphabetical.
+        """
+        query = normalize(query)
+        if not query or limit <= 0:
+            return []
+        start = bisect_left(self.keys, query)
+        stop = bisect_left(self.keys, query + "\uffff", lo=start)
+        # A title has at most two distinct ranks (whole and word match), so
+        # the 2 * limit best distinct ranks hold ``limit`` titles if any do.
+        wanted = 2 * limit
+        ranks = self.ranks[start:stop]
+        if len(ranks) > wanted:
+            best = np.unique(np.partition(ranks, wanted)[:wanted])
+            # Several word matches of one title share a rank; then the
+            # partition holds fewer distinct ranks and the whole range counts.
+            ranks = best if len(best) == wanted else np.unique(ranks)[:wanted]
+        else:
+            ranks = np.unique(ranks)
+        rows = dict.fromkeys(self.rows_by_rank[ranks % len(self.titles)].tolist())
+        return list(rows)[:limit]
@@ -0,0 +1,166 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from cinematch.cache import LRUCache, SQLiteStore, TieredCache
+from cinematch.catalog import get_catalog
+from cinematch.tmdb_client import get_client
+
+IMAGE_URL = "https://image.tmdb.org/t/p/w500"
+PLACEHOLDER_POSTER = "https://via.placeholder.com/500x750?text=No+Poster"
+
+CACHE_ENV = "CINEMATCH_TMDB_CACHE"
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "Movies",
+    "cache",
+    "tmdb.sqlite",
+)
+
+# Seconds a page waits for its detail lookups before using local data.
+DEFAULT_DEADLINE = 3.0
+MAX_WORKERS = 12
+# Batch API lookups get a pool of their own so a large batch cannot queue
+# ahead of the page renders.
+BATCH_WORKERS = 4
+
+_cache = None
+_cache_lock = threading.Lock()
+_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="tmdb")
+_batch_pool = ThreadPoolExecutor(
+    max_workers=BATCH_WORKERS, thread_name_prefix="tmdb-batch"
+)
+_local = threading.local()
+
+
+def get_cache():
+    """Process-wide metadata cache; both apps share the same SQLite file."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            path = os.environ.get(CACHE_ENV, DEFAULT_CACHE_PATH)
+            _cache = TieredCache(
+                store=SQLiteStore(path),
+                memory=LRUCache(maxsize=4096, ttl=600),
+                is_negative=lambda details: not details.get("poster_path"),
+            )
+        return _cache
+
+
+def load_details(movie_id):
+    data = get_client().movie(movie_id)
+    release_date = data.get("release_date") or ""
+    return {
+        "title": data.get("title"),
+        "overview": data.get("overview") or "",
+        "year": release_date.split("-")[0] if release_date else "",
+        "rating": data.get("vote_average"),
+        "poster_path": data.get("poster_path"),
+    }
+
+
+def _cached_details(movie_id):
+    movie_id = int(movie_id)
+    catalog = get_catalog()
+    cached = catalog.details(movie_id) if catalog is not None else None
+    if cached is None:
+        cached = get_cache().get(
+            "movie:{}".format(movie_id), lambda: load_details(movie_id)
+        )
+    return cached
+
+
+def fetch_movie_details(movie_id):
+    return _with_poster(_cached_details(movie_id))
+
+
+def fetch_poster_path(movie_id):
+    """The movie's TMDB poster path (like ``/abc.jpg``), or None."""
+    return (_cached_details(movie_id) or {}).get("poster_path")
+
+
+def local_movie_details(movie_id):
+    """Details from the local catalog only, or None if it lacks the movie."""
+    catalog = get_catalog()
+    cached = catalog.details(int(movie_id)) if catalog is not None else None
+    return None if cached is None else _with_poster(cached)
+
+
+def _with_poster(cached):
+    details = dict(cached or empty_details())
+    poster_path = details.pop("poster_path", None)
+    details["poster"] = IMAGE_URL + poster_path if poster_path else PLACEHOLDER_POSTER
+    return details
+
+
+def empty_details(title=None):
+    return {"title": title, "overview": "", "year": "", "rating": None}
+
+
+def fetch_many_details(
+    movie_ids, fallback_titles=None, deadline=DEFAULT_DEADLINE, batch=False
+):
+    """Details for every id, in order, fetched concurrently.
+
+    Lookups that fail or are still running after ``deadline`` seconds are
+    replaced by local data: the title from ``fallback_titles`` and the
+    placeholder poster. Lookups already running then keep going and fill
+    the cache; those still queued are cancelled. ``batch`` runs the lookups
+    on the batch API's own pool instead of the one pages use.
+    """
+    return list(iter_many_details(movie_ids, fallback_titles, deadline, batch))
+
+
+def iter_many_details(
+    movie_ids, fallback_titles=None, deadline=DEFAULT_DEADLINE, batch=False
+):
+    """Like fetch_many_details, but yields each entry as soon as it is ready.
+
+    All lookups start before this returns; entries come out in order, so
+    entry ``i`` waits only for itself and the entries before it. Queued
+    lookups are cancelled once the deadline passes or the iterator is
+    closed. Each entry replaced by local data adds one to the consuming
+    thread's fallback_count().
+    """
+    pool = _batch_pool if batch else _pool
+    futures = [pool.submit(fetch_movie_details, movie_id) for movie_id in movie_ids]
+    end = time.monotonic() + deadline
+
+    def generate():
+        try:
+            for i, future in enumerate(futures):
+                remaining = end - time.monotonic()
+                if remaining <= 0 and not future.done():
+                    for pending in futures[i:]:
+                        pending.cancel()
+                else:
+                    wait([future], timeout=max(0.0, remaining))
+                details = None
+                if future.done() and not future.cancelled():
+                    if future.exception() is None:
+                        details = future.result()
+                if details is None:
+                    _local.fallbacks = fallback_count() + 1
+                    title = fallback_titles[i] if fallback_titles is not None else None
+                    details = dict(empty_details(title), poster=PLACEHOLDER_POSTER)
+                yield details
+        finally:
+            for future in futures:
+                future.cancel()
+
+    return generate()
+
+
+def fallback_count():
+    """Entries replaced by local data so far by iterators in this thread."""
+    return getattr(_local, "fallbacks", 0)
+
+
+def fetch_poster(movie_id):
+    return fetch_movie_details(movie_id)["poster"]
+
+
+def cache_stats():
+    client = get_client()
+    return dict(get_cache().stats(), circuit=client.breaker.state)
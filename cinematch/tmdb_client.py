@@ -0,0 +1,195 @@
+"""HTTP client for the TMDB API shared by both apps.
+
+One pooled ``requests.Session`` with connect/read timeouts, bounded retries
+with jittered exponential backoff, a token-bucket rate limiter and a circuit
+breaker that stops calling TMDB for a while after repeated failures.
+"""
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cinematch.cache import NotFound
+
+API_KEY_ENV = "TMDB_API_KEY"
+API_URL_ENV = "TMDB_API_URL"
+DEFAULT_API_KEY = "fef9863a13e486ed5f253bad426b92e9"
+DEFAULT_API_URL = "https://api.themoviedb.org/3"
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TMDBError(Exception):
+    pass
+
+
+class CircuitOpenError(TMDBError):
+    pass
+
+
+class RateLimiter:
+    """Token bucket: ``rate`` requests per second with bursts up to ``burst``."""
+
+    def __init__(self, rate=20.0, burst=20):
+        self.rate = rate
+        self.burst = burst
+        self.acquired = 0
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self.acquired += 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def spend(self, tokens):
+        """Take ``tokens`` without waiting; later acquires wait off the debt."""
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+
+
+class CircuitBreaker:
+    """Opens after ``threshold`` consecutive failures for ``cooldown`` seconds.
+
+    Once the cooldown has passed a single trial call is let through; its
+    outcome closes the circuit again or restarts the cooldown.
+    """
+
+    def __init__(self, threshold=5, cooldown=30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.cooldown:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown or self._trial:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+
+class TMDBClient:
+    def __init__(
+        self,
+        api_key=None,
+        base_url=None,
+        timeout=(3.05, 5.0),
+        retries=2,
+        backoff=0.3,
+        rate_limiter=None,
+        breaker=None,
+        pool_size=16,
+    ):
+        self.api_key = api_key or os.environ.get(API_KEY_ENV, DEFAULT_API_KEY)
+        base_url = base_url or os.environ.get(API_URL_ENV, DEFAULT_API_URL)
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _sleep_before_retry(self, attempt, response=None):
+        delay = self.backoff * (2**attempt)
+        if response is not None and response.headers.get("Retry-After", "").isdigit():
+            delay = max(delay, float(response.headers["Retry-After"]))
+        time.sleep(random.uniform(0, delay))
+
+    def get_json(self, path, **params):
+        """GET ``path`` and return the decoded JSON body.
+
+        Raises NotFound for 404, CircuitOpenError while the breaker is open
+        and TMDBError once the retries are used up.
+        """
+        params = dict(params, api_key=self.api_key)
+        url = self.base_url + path
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError("TMDB circuit is open")
+            self.rate_limiter.acquire()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except requests.RequestException as exc:
+                self.breaker.record_failure()
+                if attempt == self.retries:
+                    raise TMDBError(str(exc)) from exc
+                self._sleep_before_retry(attempt)
+                continue
+            if response.status_code in RETRY_STATUSES:
+                self.breaker.record_failure()
+                if attempt == self.retries:
+                    raise TMDBError(
+                        "TMDB returned {} for {}".format(response.status_code, path)
+                    )
+                self._sleep_before_retry(attempt, response)
+                continue
+            self.breaker.record_success()
+            if response.status_code == 404:
+                raise NotFound(path)
+            if not response.ok:
+                raise TMDBError(
+                    "TMDB returned {} for {}".format(response.status_code, path)
+                )
+            return response.json()
+
+    def movie(self, movie_id):
+        return self.get_json("/movie/{}".format(int(movie_id)), language="en-US")
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = TMDBClient()
+        return _client
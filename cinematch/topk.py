@@ -0,0 +1,72 @@
+import numpy as np
+
+# Rows of a score block whose thresholds are found together, bounding the
+# partition's scratch copy.
+PARTITION_BYTES = 4 * 2**20
+
+
+def top_k(scores, k, exclude=None):
+    """Return (rows, scores) of the k best entries, best first.
+
+    Ties are broken by the lower row index, which matches the stable
+    ``sorted(..., reverse=True)`` ordering the apps used before.
+    """
+    scores = np.asarray(scores)
+    n = scores.shape[0]
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=scores.dtype)
+
+    extra = 0 if exclude is None else 1
+    kth = min(k + extra, n)
+    if kth < n:
+        part = np.argpartition(scores, n - kth)[n - kth :]
+        threshold = scores[part].min()
+        # Re-select everything at or above the threshold so that ties on the
+        # boundary are resolved by index instead of by argpartition's choice.
+        candidates = np.flatnonzero(scores >= threshold)
+    else:
+        candidates = np.arange(n)
+
+    if exclude is not None:
+        candidates = candidates[candidates != exclude]
+
+    order = np.lexsort((candidates, -scores[candidates]))[:k]
+    rows = candidates[order]
+    return rows, scores[rows]
+
+
+def top_k_rows(scores, k, exclude=None):
+    """Row-wise top_k over a 2-D score block.
+
+    ``exclude`` is an optional array with one column index per row to skip
+    (usually the query item itself); those entries are set to -inf in place,
+    so pass a block the caller no longer needs as is. Each row's k-th best
+    value is found with a value-only partition, which is much cheaper than
+    argpartition; every entry at or above it is then ordered by score and
+    index, so ties come out the same as calling top_k once per row. The
+    partition and the threshold pass run on slices of PARTITION_BYTES, so
+    the scratch memory does not grow with the block.
+    """
+    scores = np.asarray(scores)
+    n_rows, n = scores.shape
+    k = min(k, n - (0 if exclude is None else 1))
+    if k <= 0 or n_rows == 0:
+        shape = (n_rows, max(k, 0))
+        return np.empty(shape, dtype=np.int64), np.empty(shape, dtype=scores.dtype)
+
+    if exclude is not None:
+        scores[np.arange(n_rows), np.asarray(exclude)] = -np.inf
+
+    step = max(1, PARTITION_BYTES // (scores.itemsize * n))
+    found = []
+    for start in range(0, n_rows, step):
+        part = scores[start : start + step]
+        threshold = np.partition(part, n - k, axis=1)[:, n - k : n - k + 1]
+        # flatnonzero + divmod is several times faster than 2-D nonzero.
+        found.append(np.flatnonzero(part >= threshold) + start * n)
+    cand_rows, cand_cols = np.divmod(np.concatenate(found), n)
+    cand_scores = scores[cand_rows, cand_cols]
+    order = np.lexsort((cand_cols, -cand_scores, cand_rows))
+    first = np.searchsorted(cand_rows[order], np.arange(n_rows))
+    take = order[first[:, None] + np.arange(k)]
+    return cand_cols[take].astype(np.int64), cand_scores[take]
@@ -0,0 +1,208 @@
+"""Add or change movies in a built model without rebuilding it.
+
+New and changed movies are vectorised with the model's frozen vocabulary and
+only their similarity rows are computed, so an update costs
+O(changed x N) instead of the O(N^2) of a full build:
+
+    python -m cinematch.update Movies/model changes.jsonl
+
+Each line of ``changes.jsonl`` is a movie with ``movie_id`` and ``title``
+plus either ready-made ``tags`` or the raw TMDB columns (``overview``,
+``genres``, ``keywords``, ``cast``, ``crew``). A ``movie_id`` already in the
+model replaces that movie; any other id is appended.
+
+Existing neighbor lists are patched in place: a changed movie gets its new
+score, and a movie that now scores above a list's last entry is inserted.
+When a changed movie falls out of a list, the list's next best entry is not
+known, so only those rows are recomputed in full.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from cinematch.artifacts import load_model, save_model
+from cinematch.neighbors import BLOCK_BYTES, NeighborIndex, chunk_rows
+from cinematch.topk import top_k_rows
+
+
+def _similarities(vectors, rows, transposed):
+    block = vectors[rows] @ transposed
+    return block.toarray() if hasattr(block, "toarray") else np.asarray(block)
+
+
+def _best(ids, scores, k):
+    """Best ``k`` per row by score, ties to the lower movie row."""
+    order = np.lexsort((ids, -scores), axis=-1)[:, :k]
+    return (
+        np.take_along_axis(ids, order, axis=1),
+        np.take_along_axis(scores, order, axis=1),
+    )
+
+
+def apply_changes(model, changes, block_bytes=BLOCK_BYTES):
+    """Return the updated model contents plus counts of what was touched.
+
+    ``changes`` is a list of ``(movie_id, title, tags)``.
+    """
+    from scipy.sparse import vstack
+
+    from cinematch.vectors import frozen_vectors
+
+    if model.vocabulary is None:
+        raise ValueError("model has no stored vocabulary; rebuild it first")
+    n = len(model)
+    movie_ids = model.movie_ids.tolist()
+    titles = model.titles.tolist()
+    tags = model.tags.tolist()
+    id_to_row = {}
+    for row, movie_id in enumerate(movie_ids):
+        id_to_row.setdefault(movie_id, row)
+
+    changed = {}
+    for movie_id, title, text in changes:
+        row = id_to_row.get(int(movie_id))
+        if row is None:
+            row = id_to_row[int(movie_id)] = len(movie_ids)
+            movie_ids.append(int(movie_id))
+            titles.append(title)
+            tags.append(text)
+        else:
+            titles[row] = title
+            tags[row] = text
+        changed[row] = None
+    changed = np.asarray(list(changed), dtype=np.int64)
+    total = len(movie_ids)
+
+    fresh = frozen_vectors(model.vocabulary.tolist(), [tags[r] for r in changed])
+    order = np.arange(total)
+    order[changed] = n + np.arange(len(changed))
+    vectors = vstack([model.vectors, fresh]).tocsr()[order]
+    transposed = vectors.T.tocsc()
+
+    k = model.neighbors.k
+    ids = np.full((total, k), -1, dtype=np.int64)
+    scores = np.full((total, k), -np.inf, dtype=np.float32)
+    ids[:n] = model.neighbors.ids
+    scores[:n] = model.neighbors.scores
+    old_last = scores[:, -1].copy()
+
+    # Drop stale entries that point at a changed movie.
+    is_changed = np.zeros(total, dtype=bool)
+    is_changed[changed] = True
+    stale = is_changed[np.maximum(ids, 0)] & (ids >= 0)
+    had_stale = stale.any(axis=1)
+    scores[stale] = -np.inf
+    ids[stale] = -1
+    ids[had_stale], scores[had_stale] = _best(ids[had_stale], scores[had_stale], k)
+
+    similarity = None
+    if model.similarity is not None:
+        similarity = np.zeros((total, total), dtype=model.similarity.dtype)
+        similarity[:n, :n] = model.similarity
+
+    inserted = np.zeros(total, dtype=bool)
+    chunk_size = chunk_rows(total, block_bytes)
+    for start in range(0, len(changed), chunk_size):
+        rows = changed[start : start + chunk_size]
+        block = _similarities(vectors, rows, transposed)
+        if similarity is not None:
+            similarity[rows, :] = block
+            similarity[:, rows] = block.T
+        top, top_scores = top_k_rows(block, k, exclude=rows)
+        ids[rows], scores[rows] = top, top_scores
+
+        # Unchanged rows only need the changed movies that beat their last
+        # entry. Stored scores are float16, so compare at that precision.
+        candidates = block.T.astype(np.float16).astype(np.float32)
+        hits = (candidates > scores[:, -1:]).any(axis=1) & ~is_changed
+        hit_rows = np.flatnonzero(hits)
+        if hit_rows.size:
+            merged_ids = np.hstack(
+                [ids[hit_rows], np.broadcast_to(rows, (hit_rows.size, rows.size))]
+            )
+            merged_scores = np.hstack([scores[hit_rows], candidates[hit_rows]])
+            ids[hit_rows], scores[hit_rows] = _best(merged_ids, merged_scores, k)
+            inserted[hit_rows] = True
+
+    # A row that lost an entry is exact only if its new last entry is at least
+    # as good as the old one; otherwise an unseen movie may belong in the list.
+    recompute = np.flatnonzero(had_stale & ~is_changed & (scores[:, -1] < old_last))
+    for start in range(0, len(recompute), chunk_size):
+        rows = recompute[start : start + chunk_size]
+        block = _similarities(vectors, rows, transposed)
+        ids[rows], scores[rows] = top_k_rows(block, k, exclude=rows)
+
+    index = NeighborIndex(ids.astype(np.int32), scores.astype(np.float16))
+    stats = {
+        "changed": int(np.count_nonzero(changed < n)),
+        "added": int(np.count_nonzero(changed >= n)),
+        "patched": int(np.count_nonzero((inserted | had_stale) & ~is_changed)),
+        "recomputed": int(len(recompute)),
+    }
+    contents = {
+        "movie_ids": movie_ids,
+        "titles": titles,
+        "tags": tags,
+        "vectors": vectors,
+        "index": index,
+        "similarity": similarity,
+        "vocabulary": model.vocabulary.tolist(),
+    }
+    return contents, stats
+
+
+def update_model(path, changes, output=None):
+    """Apply ``changes`` to the model at ``path`` and publish the result.
+
+    The new version is written next to the old one and swapped in, so
+    running apps keep serving the old files until they reopen the model.
+    """
+    model = load_model(path)
+    contents, stats = apply_changes(model, changes)
+    save_model(output or path, **contents)
+    return stats
+
+
+def read_changes(path):
+    from cinematch.build import record_tags
+
+    changes = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            tags = record.get("tags")
+            if tags is None:
+                tags = record_tags(record)
+            changes.append((int(record["movie_id"]), record["title"], tags))
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Add or replace movies in a model without a full rebuild"
+    )
+    parser.add_argument("model", help="model directory, e.g. Movies/model")
+    parser.add_argument("changes", help="JSON lines file of new or changed movies")
+    parser.add_argument(
+        "--output", help="write the updated model here instead of in place"
+    )
+    args = parser.parse_args()
+
+    before = load_model(args.model).version
+    start = time.perf_counter()
+    stats = update_model(args.model, read_changes(args.changes), output=args.output)
+    elapsed = time.perf_counter() - start
+    after = load_model(args.output or args.model).version
+    print(
+        "{changed} changed, {added} added, {patched} lists patched, "
+        "{recomputed} recomputed".format(**stats)
+    )
+    print("version {} -> {} in {:.2f}s".format(before, after, elapsed))
+
+
+if __name__ == "__main__":
+    main()
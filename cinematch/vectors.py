@@ -0,0 +1,18 @@
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import normalize
+
+MAX_FEATURES = 5000
+
+
+def tag_vectors(tags):
+    """Bag-of-words tag matrix, L2-normalised so a dot product is cosine."""
+    cv = CountVectorizer(max_features=MAX_FEATURES, stop_words="english")
+    vectors = cv.fit_transform(tags).astype("float32")
+    return normalize(vectors, norm="l2", copy=False).tocsr(), cv
+
+
+def frozen_vectors(vocabulary, tags):
+    """Vectorise ``tags`` over an existing vocabulary; unknown terms are dropped."""
+    cv = CountVectorizer(vocabulary=list(vocabulary), stop_words="english")
+    vectors = cv.transform(tags).astype("float32")
+    return normalize(vectors, norm="l2", copy=False).tocsr()
@@ -0,0 +1,296 @@
+"""Background cache warming driven by observed traffic.
+
+``Popularity`` keeps an exponentially decayed hit count per movie id: a hit
+is worth twice as much as one ``half_life`` seconds earlier, so the ranking
+follows current traffic without any sweeping. ``CacheWarmer`` periodically
+takes the most popular ids and calls ``warm(movie_id)`` for each on a small
+thread pool. Its budget is counted in TMDB requests: every request the
+client makes while a movie warms is charged to the warmer's own token
+bucket, so warming never takes more than ``workers`` threads and about
+``rate`` of the client's requests per second, and backs off while visitors
+keep the client busy.
+
+Each process saves the hits it observed to its own snapshot file
+(``popularity.<pid>-<start>.json`` next to the configured path) after every
+round. On start the warmer merges every snapshot there, so a restarted app
+warms what was popular in all its workers before it went down; snapshots
+older than ``STALE_HALF_LIVES`` half-lives are deleted.
+"""
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cinematch.tmdb_client import RateLimiter, get_client
+
+ENABLED_ENV = "CINEMATCH_WARMER"
+SNAPSHOT_ENV = "CINEMATCH_WARMER_SNAPSHOT"
+TOP_ENV = "CINEMATCH_WARMER_TOP"
+INTERVAL_ENV = "CINEMATCH_WARMER_INTERVAL"
+WORKERS_ENV = "CINEMATCH_WARMER_WORKERS"
+RATE_ENV = "CINEMATCH_WARMER_RATE"
+DEFAULT_SNAPSHOT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "Movies",
+    "cache",
+    "popularity.json",
+)
+DEFAULT_HALF_LIFE = 6 * 3600
+DEFAULT_TOP = 50
+DEFAULT_INTERVAL = 300
+DEFAULT_WORKERS = 2
+# TMDB requests per second; the shared client allows 20.
+DEFAULT_RATE = 4.0
+MAX_KEYS = 10000
+STALE_HALF_LIVES = 4
+
+
+class Popularity:
+    """Decayed hit counts per key.
+
+    Scores are stored scaled to ``epoch`` instead of being decayed in place,
+    so a hit only touches its own entry.
+    """
+
+    def __init__(self, half_life=DEFAULT_HALF_LIFE, max_keys=MAX_KEYS):
+        self.half_life = half_life
+        self.max_keys = max_keys
+        self.epoch = time.time()
+        self._scores = {}
+        self._lock = threading.Lock()
+
+    def _weight(self, now):
+        return 2.0 ** ((now - self.epoch) / self.half_life)
+
+    def hit(self, key, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            weight = self._weight(now)
+            if weight > 1e12:
+                # Rebase before the scaled weights lose precision.
+                for k in self._scores:
+                    self._scores[k] /= weight
+                self.epoch, weight = now, 1.0
+            self._scores[key] = self._scores.get(key, 0.0) + weight
+            if len(self._scores) > self.max_keys * 2:
+                self._scores = dict(self._top(self.max_keys))
+
+    def _top(self, n):
+        return sorted(self._scores.items(), key=lambda item: -item[1])[:n]
+
+    def top(self, n, now=None):
+        """The ``n`` most popular keys with their current decayed counts."""
+        now = time.time() if now is None else now
+        with self._lock:
+            weight = self._weight(now)
+            return [(key, score / weight) for key, score in self._top(n)]
+
+    def __len__(self):
+        return len(self._scores)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "half_life": self.half_life,
+                "epoch": self.epoch,
+                "scores": [[key, score] for key, score in self._scores.items()],
+            }
+
+    def restore(self, snapshot):
+        """Merge a ``snapshot()``, decayed from the time it was taken."""
+        with self._lock:
+            scale = 2.0 ** ((snapshot["epoch"] - self.epoch) / self.half_life)
+            for key, score in snapshot["scores"]:
+                self._scores[key] = self._scores.get(key, 0.0) + score * scale
+
+
+def save_snapshot(path, popularity):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".popularity-", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(popularity.snapshot(), f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def load_snapshot(path, popularity):
+    """Merge the snapshot at ``path``; returns False if there is none."""
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return False
+    popularity.restore(snapshot)
+    return True
+
+
+def process_snapshot_path(path, started=None):
+    """This process's snapshot file for the configured ``path``."""
+    started = time.time() if started is None else started
+    stem, ext = os.path.splitext(path)
+    return "{}.{}-{}{}".format(stem, os.getpid(), int(started), ext)
+
+
+def load_snapshots(path, popularity, max_age=None):
+    """Merge ``path`` and every process snapshot next to it.
+
+    Files not written for ``max_age`` seconds are deleted instead; returns
+    how many were merged.
+    """
+    stem, ext = os.path.splitext(path)
+    merged = 0
+    for name in [path] + glob.glob(glob.escape(stem) + ".*-*" + ext):
+        try:
+            age = time.time() - os.stat(name).st_mtime
+            if max_age is not None and age > max_age:
+                os.unlink(name)
+                continue
+        except OSError:
+            continue  # gone, or removed by another worker meanwhile
+        merged += load_snapshot(name, popularity)
+    return merged
+
+
+class CacheWarmer:
+    """Warms the most popular keys every ``interval`` seconds.
+
+    ``usage()`` returns a running count of TMDB requests; what a key's
+    warming adds to it is charged to the ``rate`` budget. Without it each
+    key costs one token.
+    """
+
+    def __init__(
+        self,
+        popularity,
+        warm,
+        top=DEFAULT_TOP,
+        interval=DEFAULT_INTERVAL,
+        workers=DEFAULT_WORKERS,
+        rate=DEFAULT_RATE,
+        snapshot_path=None,
+        usage=None,
+    ):
+        self.popularity = popularity
+        # Counts restored from snapshots, kept apart so that this process
+        # only ever saves the hits it observed itself.
+        self.restored = Popularity(popularity.half_life)
+        self.warm = warm
+        self.top = top
+        self.interval = interval
+        self.workers = workers
+        self.limiter = RateLimiter(rate=rate, burst=max(1, workers))
+        self.usage = usage
+        self.snapshot_path = snapshot_path
+        self._own_snapshot = None
+        self.rounds = 0
+        self.warmed = 0
+        self.errors = 0
+        self.last_round = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread = None
+
+    def _warm_one(self, key):
+        self.limiter.acquire()
+        before = self.usage() if self.usage else 0
+        try:
+            self.warm(key)
+            return True
+        except Exception:
+            return False  # counted; the visitor's request will retry it
+        finally:
+            if self.usage:
+                # Also counts visitors' requests made meanwhile, so the
+                # warmer slows down when the client is busy.
+                self.limiter.spend(max(0, self.usage() - before - 1))
+
+    def ranked(self, n):
+        """The ``n`` most popular keys over restored and observed hits."""
+        scores = dict(self.restored.top(MAX_KEYS))
+        for key, score in self.popularity.top(MAX_KEYS):
+            scores[key] = scores.get(key, 0.0) + score
+        return sorted(scores.items(), key=lambda item: -item[1])[:n]
+
+    def run_once(self):
+        """Warm the current top keys; returns how many succeeded."""
+        start = time.perf_counter()
+        keys = [key for key, _ in self.ranked(self.top)]
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="warmer") as pool:
+            done = list(pool.map(self._warm_one, keys))
+        ok = sum(done)
+        self.rounds += 1
+        self.warmed += ok
+        self.errors += len(done) - ok
+        self.last_round = {
+            "keys": len(keys),
+            "warmed": ok,
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+        if self._own_snapshot:
+            try:
+                save_snapshot(self._own_snapshot, self.popularity)
+            except OSError:
+                pass  # warming still works, the next restart just starts cold
+        return ok
+
+    def _loop(self):
+        # The first round runs right away, on the counts from the snapshot.
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Start warming in the background; later calls do nothing."""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            if self.snapshot_path:
+                max_age = STALE_HALF_LIVES * self.popularity.half_life
+                load_snapshots(self.snapshot_path, self.restored, max_age=max_age)
+                self._own_snapshot = process_snapshot_path(self.snapshot_path)
+            self._thread = threading.Thread(
+                target=self._loop, name="cache-warmer", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self):
+        return {
+            "tracked": len(self.popularity),
+            "restored": len(self.restored),
+            "top": self.ranked(10),
+            "rounds": self.rounds,
+            "warmed": self.warmed,
+            "errors": self.errors,
+            "last_round": self.last_round,
+        }
+
+
+def warmer_from_env(popularity, warm):
+    """A CacheWarmer configured by the CINEMATCH_WARMER_* variables."""
+    env = os.environ
+    return CacheWarmer(
+        popularity,
+        warm,
+        top=int(env.get(TOP_ENV, 0)) or DEFAULT_TOP,
+        interval=float(env.get(INTERVAL_ENV, 0)) or DEFAULT_INTERVAL,
+        workers=int(env.get(WORKERS_ENV, 0)) or DEFAULT_WORKERS,
+        rate=float(env.get(RATE_ENV, 0)) or DEFAULT_RATE,
+        snapshot_path=env.get(SNAPSHOT_ENV, DEFAULT_SNAPSHOT_PATH),
+        usage=lambda: get_client().rate_limiter.acquired,
+    )
+
+
+def warmer_enabled():
+    return os.environ.get(ENABLED_ENV, "1") != "0"
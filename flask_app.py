@@ -1,106 +1,103 @@
-from flask import Flask, render_template_string, request, session
-import pickle
+import functools
+import hashlib
+import hmac
 import os
-import pandas as pd
-import requests
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import random
 import json
-import difflib
-
-
-base_dir = os.path.dirname(os.path.abspath(__file__))
-movies_dir = os.path.join(base_dir, "Movies")
-
-movies_dict_path = os.path.join(movies_dir, "movies_dict.pkl")
-movies_pkl_path = os.path.join(movies_dir, "movies.pkl")
-similarity_path = os.path.join(movies_dir, "similarity.pkl")
-
-
-def fetch_poster(movie_id):
-    response = requests.get(
-        "https://api.themoviedb.org/3/movie/{}?api_key=fef9863a13e486ed5f253bad426b92e9&language=en-US".format(
-            movie_id
-        )
+import sys
+
+from cinematch.startup import PROFILE_FLAG, StartupProfile
+
+startup = StartupProfile()
+
+with startup.phase("import flask"):
+    from flask import (
+        Flask,
+        copy_current_request_context,
+        jsonify,
+        redirect,
+        render_template_string,
+        request,
+        session,
+        stream_template_string,
+        stream_with_context,
     )
-    data = response.json()
-    return "https://image.tmdb.org/t/p/w500" + data["poster_path"]
 
-
-def fetch_movie_details(movie_id):
-    response = requests.get(
-        "https://api.themoviedb.org/3/movie/{}?api_key=fef9863a13e486ed5f253bad426b92e9&language=en-US".format(
-            movie_id
-        )
+with startup.phase("import cinematch"):
+    from cinematch.analytics import get_stats
+    from cinematch.artifacts import open_model
+    from cinematch.catalog import get_catalog
+    from cinematch.engines import engine_mode, load_engine
+    from cinematch.fuzzy import FuzzyTitleIndex
+    from cinematch.pagecache import DEFAULT_MAX_BYTES, MAX_BYTES_ENV, PageCache
+    from cinematch.posters import SIZES as POSTER_SIZES
+    from cinematch.posters import get_proxy as get_poster_proxy
+    from cinematch.posters import read_poster
+    from cinematch.recommender import MovieIndex, Recommender
+    from cinematch.search import SearchIndex
+    from cinematch.suggest import DEFAULT_LIMIT, PrefixIndex
+    from cinematch.tmdb import (
+        PLACEHOLDER_POSTER,
+        cache_stats,
+        fallback_count,
+        fetch_many_details,
+        iter_many_details,
+        local_movie_details,
     )
-    data = response.json()
-    title = data.get("title")
-    overview = data.get("overview") or ""
-    release_date = data.get("release_date") or ""
-    year = release_date.split("-")[0] if release_date else ""
-    rating = data.get("vote_average")
-    poster_path = data.get("poster_path")
-    poster = (
-        "https://image.tmdb.org/t/p/w500" + poster_path
-        if poster_path
-        else fetch_poster(movie_id)
-    )
-    return {
-        "title": title,
-        "overview": overview,
-        "year": year,
-        "rating": rating,
-        "poster": poster,
-    }
+    from cinematch.tmdb_client import TMDBError
+    from cinematch.warmer import Popularity, warmer_enabled, warmer_from_env
 
 
-if os.path.exists(movies_dict_path):
-    movies_dict = pickle.load(open(movies_dict_path, "rb"))
-elif os.path.exists(movies_pkl_path):
-    movies_dict = pickle.load(open(movies_pkl_path, "rb"))
-else:
-    raise FileNotFoundError("movies_dict.pkl or movies.pkl not found in Movies directory")
-
-movies = pd.DataFrame(movies_dict)
-
-if os.path.exists(similarity_path):
-    similarity = pickle.load(open(similarity_path, "rb"))
-else:
-    cv = CountVectorizer(max_features=5000, stop_words="english")
-    vectors = cv.fit_transform(movies["tags"]).toarray()
-    similarity = cosine_similarity(vectors)
-    with open(similarity_path, "wb") as f:
-        pickle.dump(similarity, f)
-
-
-def recommend(movie_title, top_n=6):
-    movie_index = movies[movies["title"] == movie_title].index[0]
-    distances = similarity[movie_index]
-    movies_list = sorted(
-        list(enumerate(distances)), reverse=True, key=lambda x: x[1]
-    )[1 : top_n + 1]
-
-    recommendations = []
-    for idx, score in movies_list:
-        row = movies.iloc[idx]
-        movie_id = int(row.movie_id)
-        details = fetch_movie_details(movie_id)
-        overview = details["overview"]
-        if len(overview) > 180:
-            overview = overview[:180] + "..."
-        recommendations.append(
-            {
-                "movie_id": movie_id,
-                "title": details["title"] or row.title,
-                "year": details["year"],
-                "poster": details["poster"],
-                "rating": details["rating"],
-                "similarity": float(score),
-                "overview": overview,
-            }
-        )
-    return recommendations
+base_dir = os.path.dirname(os.path.abspath(__file__))
+movies_dir = os.path.join(base_dir, "Movies")
+BATCH_LIMIT = 10000
+# Seeds x n when the batch asks for TMDB details, which cost a lookup each.
+BATCH_DETAILS_LIMIT = 200
+# Versioned JSON only changes with the model, so caches may keep it for an
+# hour and revalidate with its ETag; TMDB details go stale sooner.
+API_MAX_AGE = 3600
+API_DETAILS_MAX_AGE = 600
+# Poster URLs are keyed by movie, not content, so browsers revalidate them
+# daily with the content-hash ETag.
+POSTER_MAX_AGE = 86400
+ADMIN_TOKEN_ENV = "CINEMATCH_ADMIN_TOKEN"
+# Send page shells right away and cards as their details arrive.
+STREAM_ENV = "CINEMATCH_STREAM"
+stream_pages = os.environ.get(STREAM_ENV, "1") != "0"
+
+with startup.phase("open model"):
+    model = open_model(movies_dir, dense=engine_mode() == "dense")
+with startup.phase("load engine"):
+    engine = load_engine(model)
+with startup.phase("title index"):
+    movie_index = MovieIndex(model.movie_ids, model.titles.tolist())
+    recommender = Recommender(movie_index, engine)
+with startup.phase("fuzzy + prefix index"):
+    title_matcher = FuzzyTitleIndex(movie_index.titles)
+    title_suggester = PrefixIndex(movie_index.titles)
+with startup.phase("search index"):
+    search_index = SearchIndex(model.tags.tolist())
+with startup.phase("analytics"):
+    # Read from the model header; older models count their tags here
+    # rather than on the first /dashboard request.
+    get_stats(model, get_catalog())
+
+page_cache = PageCache(
+    max_bytes=int(os.environ.get(MAX_BYTES_ENV, 0)) * 2**20 or DEFAULT_MAX_BYTES
+)
+popularity = Popularity()
+
+
+def recommend(movie_title, top_n=6, stream=False):
+    return recommender.recommend(movie_title, top_n=top_n, stream=stream)
+
+
+def recommend_by_id(movie_id, top_n=6, stream=False):
+    return recommender.recommend_by_id(movie_id, top_n=top_n, stream=stream)
+
+
+def recommend_batch(seeds, top_n=10, details=False):
+    return recommender.recommend_batch(seeds, top_n=top_n, details=details)
 
 
 app = Flask(__name__)
@@ -145,6 +142,7 @@ HOME_TEMPLATE = """
         <ul class="navbar-nav ms-auto">
           <li class="nav-item"><a class="nav-link active" href="/">Home</a></li>
           <li class="nav-item"><a class="nav-link" href="/recommend">Recommend</a></li>
+          <li class="nav-item"><a class="nav-link" href="/search">Search</a></li>
           <li class="nav-item"><a class="nav-link" href="/dashboard">Analytics</a></li>
           <li class="nav-item"><a class="nav-link" href="/profile">Profile</a></li>
         </ul>
@@ -184,7 +182,7 @@ HOME_TEMPLATE = """
         {% for rec in trending %}
           <div class="col-lg-3 col-md-4 col-sm-6 col-12 mb-4">
             <div class="card bg-secondary text-light h-100 position-relative">
-              <img src="{{ rec.poster }}" class="card-img-top" alt="{{ rec.title }}">
+              <img src="/poster/{{ rec.movie_id }}/w342" loading="lazy" class="card-img-top" alt="{{ rec.title }}">
               <div class="card-body">
                 <h6 class="card-title mb-1">
                   <a href="/movie/{{ rec.movie_id }}" class="stretched-link text-decoration-none text-light">
@@ -218,7 +216,7 @@ DETAIL_TEMPLATE = """
 <html lang="en">
 <head>
   <meta charset="utf-8">
-  <title>{{ movie.title }} - Details</title>
+  <title>{{ title }} - Details</title>
   <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/bootstrap.min.css">
   <style>
     body {
@@ -238,6 +236,7 @@ DETAIL_TEMPLATE = """
         <ul class="navbar-nav ms-auto">
           <li class="nav-item"><a class="nav-link" href="/">Home</a></li>
           <li class="nav-item"><a class="nav-link" href="/recommend">Recommend</a></li>
+          <li class="nav-item"><a class="nav-link" href="/search">Search</a></li>
           <li class="nav-item"><a class="nav-link" href="/dashboard">Analytics</a></li>
           <li class="nav-item"><a class="nav-link" href="/profile">Profile</a></li>
         </ul>
@@ -247,9 +246,10 @@ DETAIL_TEMPLATE = """
 
   <div class="container py-4">
     <a href="/recommend" class="btn btn-outline-light btn-sm mb-3">← Back to recommendations</a>
+    {% set movie = load_movie() %}
     <div class="row mb-4">
       <div class="col-md-4">
-        <img src="{{ movie.poster }}" class="img-fluid rounded-4 shadow" alt="{{ movie.title }}">
+        <img src="/poster/{{ movie_id }}/w500" class="img-fluid rounded-4 shadow" alt="{{ movie.title }}">
       </div>
       <div class="col-md-8">
         <h1 class="fw-bold mb-2">
@@ -270,7 +270,7 @@ DETAIL_TEMPLATE = """
         {% for rec in similar %}
           <div class="col-lg-3 col-md-4 col-sm-6 col-12 mb-4">
             <div class="card bg-secondary text-light h-100 position-relative">
-              <img src="{{ rec.poster }}" class="card-img-top" alt="{{ rec.title }}">
+              <img src="/poster/{{ rec.movie_id }}/w342" loading="lazy" class="card-img-top" alt="{{ rec.title }}">
               <div class="card-body">
                 <h6 class="card-title mb-1">
                   <a href="/movie/{{ rec.movie_id }}" class="stretched-link text-decoration-none text-light">
@@ -328,6 +328,7 @@ DASHBOARD_TEMPLATE = """
         <ul class="navbar-nav ms-auto">
           <li class="nav-item"><a class="nav-link" href="/">Home</a></li>
           <li class="nav-item"><a class="nav-link" href="/recommend">Recommend</a></li>
+          <li class="nav-item"><a class="nav-link" href="/search">Search</a></li>
           <li class="nav-item"><a class="nav-link active" href="/dashboard">Analytics</a></li>
           <li class="nav-item"><a class="nav-link" href="/profile">Profile</a></li>
         </ul>
@@ -466,6 +467,7 @@ PROFILE_TEMPLATE = """
         <ul class="navbar-nav ms-auto">
           <li class="nav-item"><a class="nav-link" href="/">Home</a></li>
           <li class="nav-item"><a class="nav-link" href="/recommend">Recommend</a></li>
+          <li class="nav-item"><a class="nav-link" href="/search">Search</a></li>
           <li class="nav-item"><a class="nav-link" href="/dashboard">Analytics</a></li>
           <li class="nav-item"><a class="nav-link active" href="/profile">Profile</a></li>
         </ul>
@@ -486,7 +488,7 @@ PROFILE_TEMPLATE = """
         {% for rec in recent_movies %}
           <div class="col-lg-3 col-md-4 col-sm-6 col-12 mb-4">
             <div class="card bg-secondary text-light h-100 position-relative">
-              <img src="{{ rec.poster }}" class="card-img-top" alt="{{ rec.title }}">
+              <img src="/poster/{{ rec.movie_id }}/w342" loading="lazy" class="card-img-top" alt="{{ rec.title }}">
               <div class="card-body">
                 <h6 class="card-title mb-1">
                   <a href="/movie/{{ rec.movie_id }}" class="stretched-link text-decoration-none text-light">
@@ -509,7 +511,7 @@ PROFILE_TEMPLATE = """
         {% for rec in suggested_movies %}
           <div class="col-lg-3 col-md-4 col-sm-6 col-12 mb-4">
             <div class="card bg-secondary text-light h-100 position-relative">
-              <img src="{{ rec.poster }}" class="card-img-top" alt="{{ rec.title }}">
+              <img src="/poster/{{ rec.movie_id }}/w342" loading="lazy" class="card-img-top" alt="{{ rec.title }}">
               <div class="card-body">
                 <h6 class="card-title mb-1">
                   <a href="/movie/{{ rec.movie_id }}" class="stretched-link text-decoration-none text-light">
@@ -532,6 +534,91 @@ PROFILE_TEMPLATE = """
 """
 
 
+SEARCH_TEMPLATE = """
+<!doctype html>
+<html lang="en">
+<head>
+  <meta charset="utf-8">
+  <title>Keyword Search</title>
+  <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/bootstrap.min.css">
+  <style>
+    body {
+      background: radial-gradient(circle at top, #1f2933 0, #050816 55%);
+      color: #f9fafb;
+    }
+  </style>
+</head>
+<body>
+  <nav class="navbar navbar-expand-lg navbar-dark bg-dark">
+    <div class="container">
+      <a class="navbar-brand" href="/">MovieRS</a>
+      <button class="navbar-toggler" type="button" data-bs-toggle="collapse" data-bs-target="#navbarNav">
+        <span class="navbar-toggler-icon"></span>
+      </button>
+      <div class="collapse navbar-collapse" id="navbarNav">
+        <ul class="navbar-nav ms-auto">
+          <li class="nav-item"><a class="nav-link" href="/">Home</a></li>
+          <li class="nav-item"><a class="nav-link" href="/recommend">Recommend</a></li>
+          <li class="nav-item"><a class="nav-link active" href="/search">Search</a></li>
+          <li class="nav-item"><a class="nav-link" href="/dashboard">Analytics</a></li>
+          <li class="nav-item"><a class="nav-link" href="/profile">Profile</a></li>
+        </ul>
+      </div>
+    </div>
+  </nav>
+
+  <div class="container py-4">
+    <h1 class="fw-bold mb-1">Keyword search</h1>
+    <p class="text-secondary">
+      Search plot words, genres, keywords, cast and directors (e.g. <em>space marine</em>,
+      <em>christophernolan</em>, <em>alien OR predator</em>).
+    </p>
+
+    <form method="get" class="row gy-3 gx-3 align-items-end mb-4">
+      <div class="col-md-7">
+        <input type="text" name="q" class="form-control" placeholder="Keywords" value="{{ query }}">
+      </div>
+      <div class="col-md-3">
+        <select name="op" class="form-select">
+          <option value="and" {% if op == "and" %}selected{% endif %}>All words</option>
+          <option value="or" {% if op == "or" %}selected{% endif %}>Any word</option>
+        </select>
+      </div>
+      <div class="col-md-2 d-grid">
+        <button type="submit" class="btn btn-primary">Search</button>
+      </div>
+    </form>
+
+    {% if missing %}
+      <div class="alert alert-warning" role="alert">
+        No movies mention: {{ missing|join(", ") }}
+      </div>
+    {% endif %}
+
+    {% if query and not results %}
+      <p class="text-secondary">No matches.</p>
+    {% endif %}
+
+    {% if results %}
+      <ul class="list-group">
+        {% for movie in results %}
+          <li class="list-group-item bg-dark text-light d-flex justify-content-between align-items-center">
+            <a href="/movie/{{ movie.movie_id }}" class="text-decoration-none text-light">{{ movie.title }}</a>
+            <span>
+              <span class="badge bg-secondary me-2">{{ '{:.1f}'.format(movie.score) }}</span>
+              <a href="/recommend?movie_id={{ movie.movie_id }}" class="btn btn-sm btn-outline-info">Similar</a>
+            </span>
+          </li>
+        {% endfor %}
+      </ul>
+    {% endif %}
+  </div>
+  <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/js/bootstrap.bundle.min.js"></script>
+</body>
+</html>
+"""
+
+
 PAGE_TEMPLATE = """
 <!doctype html>
 <html lang="en">
@@ -570,6 +657,7 @@ PAGE_TEMPLATE = """
         <ul class="navbar-nav ms-auto">
           <li class="nav-item"><a class="nav-link" href="/">Home</a></li>
           <li class="nav-item"><a class="nav-link active" href="/recommend">Recommend</a></li>
+          <li class="nav-item"><a class="nav-link" href="/search">Search</a></li>
           <li class="nav-item"><a class="nav-link" href="/dashboard">Analytics</a></li>
           <li class="nav-item"><a class="nav-link" href="/profile">Profile</a></li>
         </ul>
@@ -598,12 +686,17 @@ PAGE_TEMPLATE = """
         >
       </div>
       <div class="col-md-4">
-        <label class="form-label">Or pick from the list</label>
-        <select name="movie" class="form-select">
-          {% for title in movies %}
-            <option value="{{ title }}" {% if title == selected_movie %}selected{% endif %}>{{ title }}</option>
-          {% endfor %}
-        </select>
+        <label class="form-label">Or pick a title</label>
+        <input
+          type="text"
+          name="movie"
+          class="form-control"
+          list="movie-suggestions"
+          autocomplete="off"
+          placeholder="Start typing a title"
+          value="{{ selected_movie }}"
+        >
+        <datalist id="movie-suggestions"></datalist>
       </div>
       <div class="col-md-2">
         <label class="form-label">How many results?</label>
@@ -639,7 +732,7 @@ PAGE_TEMPLATE = """
         {% for rec in recommendations %}
           <div class="col-lg-3 col-md-4 col-sm-6 col-12 mb-4">
             <div class="card bg-secondary text-light h-100 position-relative">
-              <img src="{{ rec.poster }}" class="card-img-top" alt="{{ rec.title }}">
+              <img src="/poster/{{ rec.movie_id }}/w342" loading="lazy" class="card-img-top" alt="{{ rec.title }}">
               <div class="card-body">
                 <h6 class="card-title mb-1">
                   <a href="/movie/{{ rec.movie_id }}" class="stretched-link text-decoration-none text-light">
@@ -663,19 +756,77 @@ PAGE_TEMPLATE = """
     {% endif %}
   </div>
   <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/js/bootstrap.bundle.min.js"></script>
+  <script>
+    (function () {
+      const input = document.querySelector('input[name="movie"]');
+      const list = document.getElementById("movie-suggestions");
+      let timer = null;
+      input.addEventListener("input", function () {
+        clearTimeout(timer);
+        const q = input.value.trim();
+        if (!q) { list.innerHTML = ""; return; }
+        timer = setTimeout(function () {
+          fetch("/api/suggest?q=" + encodeURIComponent(q))
+            .then(function (r) { return r.json(); })
+            .then(function (data) {
+              list.innerHTML = "";
+              data.results.forEach(function (m) {
+                const option = document.createElement("option");
+                option.value = m.title;
+                list.appendChild(option);
+              });
+            });
+        }, 120);
+      });
+    })();
+  </script>
 </body>
 </html>
 """
 
 
+def render_page(source, stream, **context):
+    """The page as an iterable of str: a Jinja stream or a single string."""
+    if stream:
+        return stream_template_string(source, **context)
+    return [render_template_string(source, **context)]
+
+
+def cached_page(route, args, render, stream):
+    """Rendered page for ``route`` and its normalized ``args``.
+
+    ``render()`` returns the page as an iterable of str. When streaming, a
+    cache miss goes out chunk by chunk as it renders and is cached at the
+    end; hits are always sent whole. HEAD requests never read a body, so
+    they get the page rendered in one piece. Pages with cards that fell
+    back to local data after the TMDB deadline are kept only briefly.
+    """
+    key = (route, args, model.version)
+    if not stream or request.method != "GET":
+        return page_cache.get(key, lambda: "".join(render()), fallbacks=fallback_count)
+    page = page_cache.stream(
+        key, render, wrap=copy_current_request_context, fallbacks=fallback_count
+    )
+    if isinstance(page, bytes):
+        return page
+    return app.response_class(stream_with_context(page), mimetype="text/html")
+
+
 @app.route("/", methods=["GET"])
 def home():
-    base_title = movies["title"].values[0]
-    try:
-        trending = recommend(base_title, top_n=8)
-    except Exception:
-        trending = []
-    return render_template_string(HOME_TEMPLATE, trending=trending)
+    return home_page(stream_pages)
+
+
+def home_page(stream=False):
+    def render():
+        base_title = movie_index.titles[0]
+        try:
+            trending = recommend(base_title, top_n=8, stream=stream)
+        except Exception:
+            trending = []
+        return render_page(HOME_TEMPLATE, stream, trending=trending)
+
+    return cached_page("home", (), render, stream)
 
 
 @app.route("/recommend", methods=["GET"])
@@ -692,139 +843,199 @@ def index():
         except ValueError:
             top_n = top_n_default
 
-    titles = movies["title"].values
+    titles = movie_index.titles
     selected_movie = request.args.get("movie") or titles[0]
+    movie_id_param = request.args.get("movie_id")
+    if movie_id_param and movie_id_param.isdigit():
+        row = movie_index.id_to_row.get(int(movie_id_param))
+        if row is not None:
+            selected_movie = titles[row]
 
     if request.args.get("random"):
-        selected_movie = movies.sample(1)["title"].values[0]
+        selected_movie = random.choice(titles)
     elif search_query:
-        titles_lower = [t.lower() for t in titles]
-        matches = difflib.get_close_matches(
-            search_query.lower(), titles_lower, n=1, cutoff=0.3
-        )
-        if matches:
-            match = matches[0]
-            match_index = titles_lower.index(match)
+        match_index = title_matcher.best(search_query)
+        if match_index is not None:
+            selected_movie = titles[match_index]
+    elif selected_movie not in movie_index.title_to_row:
+        # Free text typed into the title box: take the closest title.
+        match_index = title_matcher.best(selected_movie)
+        if match_index is not None:
             selected_movie = titles[match_index]
 
-    recommendations = None
-    error = None
+    row = movie_index.title_to_row.get(selected_movie)
+    if row is not None and not request.args.get("random"):
+        popularity.hit(int(movie_index.movie_ids[row]))
+    return recommend_page(selected_movie, top_n, search_query, stream=stream_pages)
 
-    try:
-        recommendations = recommend(selected_movie, top_n=top_n)
-    except Exception as exc:
-        error = str(exc)
 
-    return render_template_string(
-        PAGE_TEMPLATE,
-        movies=movies["title"].values,
-        selected_movie=selected_movie,
-        recommendations=recommendations,
-        error=error,
-        top_n=top_n,
-        search_query=search_query,
-    )
+def recommend_page(selected_movie, top_n=6, search_query="", stream=False):
+    def render():
+        recommendations = None
+        error = None
+
+        try:
+            recommendations = recommend(selected_movie, top_n=top_n, stream=stream)
+        except Exception as exc:
+            error = str(exc)
+
+        return render_page(
+            PAGE_TEMPLATE,
+            stream,
+            selected_movie=selected_movie,
+            recommendations=recommendations,
+            error=error,
+            top_n=top_n,
+            search_query=search_query,
+        )
+
+    # Keyed on the resolved title, so ?random=1 and fuzzy queries share pages.
+    args = (selected_movie, top_n, search_query)
+    return cached_page("recommend", args, render, stream)
 
 
 @app.route("/movie/<int:movie_id>", methods=["GET"])
 def movie_detail(movie_id):
-    details = fetch_movie_details(movie_id)
-    overview = details["overview"]
-    if len(overview) > 220:
-        overview = overview[:220] + "..."
-    movie = {
-        "title": details["title"],
-        "year": details["year"],
-        "rating": details["rating"],
-        "poster": details["poster"],
-        "overview": overview,
-    }
+    page = movie_page(movie_id, stream=stream_pages)
+    if movie_id in movie_index.id_to_row:
+        popularity.hit(movie_id)
     recent = session.get("recent_ids", [])
     if movie_id in recent:
         recent.remove(movie_id)
     recent.insert(0, movie_id)
     session["recent_ids"] = recent[:12]
+    return page
+
+
+def movie_page(movie_id, stream=False):
+    def render():
+        row = movie_index.id_to_row.get(movie_id)
+        title = movie_index.titles[row] if row is not None else None
+        # Started before the similar cards so both lookups overlap; the
+        # template only waits for it when it reaches the movie itself.
+        pending = iter_many_details([movie_id], [title])
+
+        @functools.cache
+        def load_movie():
+            details = next(pending)
+            overview = details["overview"]
+            if len(overview) > 220:
+                overview = overview[:220] + "..."
+            return {
+                "title": details["title"] or title,
+                "year": details["year"],
+                "rating": details["rating"],
+                "poster": details["poster"],
+                "overview": overview,
+            }
+
+        try:
+            similar = recommend_by_id(movie_id, top_n=6, stream=stream)
+        except Exception:
+            similar = []
+        if title is None:
+            # Not in the model: the page title has to come from TMDB.
+            title = load_movie()["title"]
+        return render_page(
+            DETAIL_TEMPLATE,
+            stream,
+            movie_id=movie_id,
+            title=title,
+            load_movie=load_movie,
+            similar=similar,
+        )
+
+    return cached_page("movie", (movie_id,), render, stream)
+
+
+def keyword_search(args):
+    query = (args.get("q") or "").strip()
+    op = "or" if args.get("op") == "or" else "and"
     try:
-        title_match = movies[movies["movie_id"] == movie_id]["title"].values[0]
-        similar = recommend(title_match, top_n=6)
-    except Exception:
-        similar = []
-    return render_template_string(DETAIL_TEMPLATE, movie=movie, similar=similar)
+        limit = min(max(int(args.get("n", 20)), 1), 100)
+    except ValueError:
+        limit = 20
+    rows, scores = search_index.search(query, n=limit, op=op)
+    _, missing, op = search_index.parse(query, op)
+    results = [
+        {
+            "movie_id": int(movie_index.movie_ids[row]),
+            "title": movie_index.titles[row],
+            "score": float(score),
+        }
+        for row, score in zip(rows, scores)
+    ]
+    return query, op, missing, results
+
+
+@app.route("/search", methods=["GET"])
+def search():
+    query, op, missing, results = keyword_search(request.args)
+    return render_template_string(
+        SEARCH_TEMPLATE, query=query, op=op, missing=missing, results=results
+    )
+
+
+@app.route("/api/search", methods=["GET"])
+def api_search():
+    query, op, missing, results = keyword_search(request.args)
+    return jsonify(query=query, op=op, missing=missing, results=results)
 
 
 @app.route("/dashboard", methods=["GET"])
 def dashboard():
-    total_movies = int(len(movies))
-    sample_titles = movies["title"].head(5).tolist()
-    tags = []
-    if "tags" in movies.columns:
-        for t in movies["tags"].dropna():
-            tags.extend(str(t).split())
-    unique_tags = len(set(tags)) if tags else 0
-
-    from collections import Counter
-
-    top_tags = Counter(tags).most_common(8) if tags else []
-    tag_labels = [t[0] for t in top_tags]
-    tag_counts = [t[1] for t in top_tags]
-
-    year_col = None
-    if "release_date" in movies.columns:
-        year_col = movies["release_date"].astype(str).str[:4]
-    elif "year" in movies.columns:
-        year_col = movies["year"].astype(str)
-
-    year_labels = []
-    year_counts = []
-    if year_col is not None:
-        year_counts_series = year_col.value_counts().sort_index()
-        year_labels = list(year_counts_series.index)
-        year_counts = list(year_counts_series.values)
-
-    stats = type(
-        "Stats",
-        (),
-        {
-            "total_movies": total_movies,
-            "unique_tags": unique_tags,
-            "sample_titles": ", ".join(sample_titles),
-            "tag_labels": json.dumps(tag_labels),
-            "tag_counts": json.dumps(tag_counts),
-            "year_labels": json.dumps(year_labels),
-            "year_counts": json.dumps(year_counts),
-        },
-    )()
+    data = get_stats(model, get_catalog())
+    stats = {
+        "total_movies": data["total_movies"],
+        "unique_tags": data["unique_tags"],
+        "sample_titles": ", ".join(data["sample_titles"]),
+        "tag_labels": json.dumps(data["tag_labels"][:8]),
+        "tag_counts": json.dumps(data["tag_counts"][:8]),
+        "year_labels": json.dumps(data["year_labels"]),
+        "year_counts": json.dumps(data["year_counts"]),
+    }
     return render_template_string(DASHBOARD_TEMPLATE, stats=stats)
 
 
+@app.route("/api/stats", methods=["GET"])
+def api_stats():
+    return jsonify(get_stats(model, get_catalog()))
+
+
 @app.route("/profile", methods=["GET"])
 def profile():
     recent_ids = session.get("recent_ids", [])
     recent_movies = []
-    if recent_ids and "movie_id" in movies.columns:
-        subset = movies[movies["movie_id"].isin(recent_ids)]
+    if recent_ids:
+        found = []
         for mid in recent_ids:
-            row = subset[subset["movie_id"] == mid]
-            if row.empty:
+            row = movie_index.id_to_row.get(int(mid))
+            if row is None:
                 continue
-            movie_id = int(mid)
-            details = fetch_movie_details(movie_id)
+            found.append((int(mid), movie_index.titles[row]))
+        all_details = fetch_many_details(
+            [movie_id for movie_id, _ in found], [title for _, title in found]
+        )
+        for (movie_id, title), details in zip(found, all_details):
             recent_movies.append(
                 {
                     "movie_id": movie_id,
-                    "title": details["title"] or row.iloc[0]["title"],
+                    "title": details["title"] or title,
                     "year": details["year"],
                     "poster": details["poster"],
                     "rating": details["rating"],
                 }
             )
     suggested_movies = []
-    if not recent_movies:
-        try:
-            base_title = movies["title"].values[0]
-            suggested_movies = recommend(base_title, top_n=8)
-        except Exception:
-            suggested_movies = []
+    try:
+        if recent_movies:
+            suggested_movies = recommender.recommend_for_history(
+                [movie["movie_id"] for movie in recent_movies], top_n=8
+            )
+        else:
+            suggested_movies = recommend(movie_index.titles[0], top_n=8)
+    except Exception:
+        suggested_movies = []
     return render_template_string(
         PROFILE_TEMPLATE,
         recent_movies=recent_movies,
@@ -832,5 +1043,223 @@ def profile():
     )
 
 
+@app.route("/api/recommend/batch", methods=["POST"])
+def api_recommend_batch():
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify(error="expected a JSON object"), 400
+    ids = body.get("ids") or []
+    titles = body.get("titles") or []
+    if not isinstance(ids, list) or not all(
+        isinstance(i, int) and not isinstance(i, bool) for i in ids
+    ):
+        return jsonify(error="ids must be a list of integers"), 400
+    if not isinstance(titles, list) or not all(isinstance(t, str) for t in titles):
+        return jsonify(error="titles must be a list of strings"), 400
+    seeds = ids + titles
+    if not seeds:
+        return jsonify(error="no ids or titles given"), 400
+    if len(seeds) > BATCH_LIMIT:
+        return jsonify(error="at most {} seeds per request".format(BATCH_LIMIT)), 400
+    try:
+        top_n = min(max(int(body.get("n", 10)), 1), model.neighbors.k)
+    except (TypeError, ValueError):
+        return jsonify(error="n must be an integer"), 400
+    details = bool(body.get("details"))
+    if details and len(seeds) * top_n > BATCH_DETAILS_LIMIT:
+        return (
+            jsonify(
+                error="at most {} results (seeds x n) with details".format(
+                    BATCH_DETAILS_LIMIT
+                )
+            ),
+            400,
+        )
+    results = recommend_batch(seeds, top_n=top_n, details=details)
+    return jsonify(n=top_n, results=results)
+
+
+def wants_details():
+    return request.args.get("details", "").lower() in ("1", "true", "yes")
+
+
+def versioned_json(build, *versions):
+    """Cacheable JSON for the current request, built only when needed.
+
+    Local data gets a strong ETag made of the model version plus a hash of
+    ``versions`` (the other data it depends on and the normalized
+    arguments), so a matching ``If-None-Match`` is answered with 304 before
+    ``build`` runs. Responses with TMDB details are hashed once built.
+    """
+    if wants_details():
+        response = jsonify(build())
+        response.add_etag()
+        response.cache_control.public = True
+        response.cache_control.max_age = API_DETAILS_MAX_AGE
+        return response.make_conditional(request)
+
+    key = "\0".join(str(part) for part in (request.path,) + versions)
+    etag = "{}-{}".format(model.version, hashlib.sha1(key.encode()).hexdigest()[:16])
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = API_MAX_AGE
+    return response
+
+
+@app.route("/api/movies/<int:movie_id>", methods=["GET"])
+def api_movie(movie_id):
+    row = movie_index.id_to_row.get(movie_id)
+    if row is None:
+        return jsonify(error="unknown movie id {}".format(movie_id)), 404
+    title = movie_index.titles[row]
+
+    def build():
+        if wants_details():
+            details = fetch_many_details([movie_id], [title])[0]
+        else:
+            details = local_movie_details(movie_id)
+        return {"movie_id": movie_id, "title": title, "details": details}
+
+    catalog = get_catalog()
+    return versioned_json(build, catalog.version if catalog is not None else None)
+
+
+@app.route("/api/movies/<int:movie_id>/similar", methods=["GET"])
+def api_similar(movie_id):
+    row = movie_index.id_to_row.get(movie_id)
+    if row is None:
+        return jsonify(error="unknown movie id {}".format(movie_id)), 404
+    try:
+        top_n = min(max(int(request.args.get("n", 10)), 1), model.neighbors.k)
+    except ValueError:
+        top_n = 10
+
+    def build():
+        rows, scores = recommender.similar_rows(row, top_n)
+        movie_ids = [int(movie_index.movie_ids[r]) for r in rows]
+        titles = [movie_index.titles[r] for r in rows]
+        results = [
+            {"movie_id": similar_id, "title": similar_title, "score": float(score)}
+            for similar_id, similar_title, score in zip(movie_ids, titles, scores)
+        ]
+        if wants_details():
+            details = fetch_many_details(movie_ids, titles)
+            for result, movie_details in zip(results, details):
+                result["details"] = movie_details
+        return {"movie_id": movie_id, "n": top_n, "results": results}
+
+    return versioned_json(build, engine_mode(), top_n)
+
+
+@app.route("/api/suggest", methods=["GET"])
+def api_suggest():
+    query = request.args.get("q") or ""
+    try:
+        limit = min(max(int(request.args.get("n", DEFAULT_LIMIT)), 1), 20)
+    except ValueError:
+        limit = DEFAULT_LIMIT
+    rows = title_suggester.suggest(query, limit=limit)
+    return jsonify(
+        query=query,
+        results=[
+            {
+                "movie_id": int(movie_index.movie_ids[row]),
+                "title": movie_index.titles[row],
+            }
+            for row in rows
+        ],
+    )
+
+
+@app.route("/api/cache", methods=["GET"])
+def api_cache():
+    return jsonify(
+        tmdb=cache_stats(),
+        pages=page_cache.stats(),
+        posters=get_poster_proxy().stats(),
+        warmer=warmer.stats(),
+    )
+
+
+@app.route("/poster/<int:movie_id>/<size>", methods=["GET"])
+def poster(movie_id, size):
+    """A movie's poster at one of the TMDB widths, from the local image cache.
+
+    Movies without a poster, and posters the image host fails to deliver,
+    redirect to the placeholder; those redirects are only cached briefly.
+    """
+    if size not in POSTER_SIZES:
+        return jsonify(error="unknown poster size {}".format(size)), 404
+    try:
+        image = get_poster_proxy().get(movie_id, size)
+        body = None
+        if image is not None and not request.if_none_match.contains(image.digest):
+            body = read_poster(image)
+    except (TMDBError, OSError):
+        # The image host failed or sent something unreadable; try again later.
+        image = None
+    if image is None:
+        response = redirect(PLACEHOLDER_POSTER)
+        response.cache_control.max_age = 300
+        return response
+    if body is None:
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(body, mimetype=image.content_type)
+    response.set_etag(image.digest)
+    response.cache_control.public = True
+    response.cache_control.max_age = POSTER_MAX_AGE
+    return response
+
+
+@app.route("/admin/cache/purge", methods=["POST"])
+def admin_purge_pages():
+    """Drop cached pages, all of them or one route's (?route=home|recommend|movie).
+
+    Needs the CINEMATCH_ADMIN_TOKEN value in an X-Admin-Token header. The
+    route does not exist when no token is configured: behind a reverse
+    proxy every client looks local, so the address proves nothing.
+    """
+    token = os.environ.get(ADMIN_TOKEN_ENV)
+    if not token:
+        return jsonify(error="not found"), 404
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), token):
+        return jsonify(error="forbidden"), 403
+    route = request.args.get("route") or None
+    return jsonify(purged=page_cache.purge(route), pages=page_cache.stats())
+
+
+def warm_movie(movie_id):
+    """Render the detail and default recommendation pages of a movie.
+
+    That computes its recommendations and pulls the TMDB details of the
+    movie and of its neighbors into the metadata cache.
+    """
+    row = movie_index.id_to_row.get(movie_id)
+    if row is None:
+        return
+    with app.app_context():
+        movie_page(movie_id)
+        recommend_page(movie_index.titles[row])
+
+
+warmer = warmer_from_env(popularity, warm_movie)
+
+
+@app.before_request
+def start_warmer():
+    # Started by the first request instead of on import, so scripts, tests
+    # and the debug reloader's parent process never warm anything.
+    if warmer_enabled():
+        warmer.start()
+
+
 if __name__ == "__main__":
-    app.run(debug=True)
+    if PROFILE_FLAG in sys.argv[1:]:
+        print(startup.report())
+    else:
+        app.run(debug=True)
@@ -0,0 +1,52 @@
+import importlib.util
+import os
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+STUB_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "tools",
+    "tmdb_stub.py",
+)
+
+
+def load_stub():
+    spec = importlib.util.spec_from_file_location("tmdb_stub", STUB_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def tmdb_stub():
+    """Start tools/tmdb_stub.py on a free port: ``start(**options) -> server``.
+
+    The server has ``url`` (the /3 API root), ``image_url`` (the /t/p root)
+    and ``seen`` (requests per path) attached.
+    """
+    stub = load_stub()
+    servers = []
+
+    def start(not_found=(), no_poster_every=0, fail_first=0, fail_statuses=(503,)):
+        handler = stub.make_handler(
+            0.0,
+            set(not_found),
+            no_poster_every,
+            fail_first=fail_first,
+            fail_statuses=fail_statuses,
+        )
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        host, port = server.server_address[:2]
+        server.url = "http://{}:{}/3".format(host, port)
+        server.image_url = "http://{}:{}/t/p".format(host, port)
+        server.seen = handler.requests_seen
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
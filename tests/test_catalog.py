@@ -0,0 +1,81 @@
+import json
+
+from cinematch.catalog import hydrate, read_checkpoint
+from cinematch.tmdb_client import CircuitBreaker, RateLimiter, TMDBClient
+
+
+def stub_client(server):
+    return TMDBClient(
+        base_url=server.url,
+        backoff=0.01,
+        rate_limiter=RateLimiter(rate=1000, burst=1000),
+        breaker=CircuitBreaker(threshold=1000),
+    )
+
+
+def movie_requests(server):
+    return {
+        int(path.rsplit("/", 1)[1]): count
+        for path, count in server.seen.items()
+        if path.startswith("/3/movie/")
+    }
+
+
+def test_hydrate_resumes_from_the_checkpoint(tmdb_stub, tmp_path):
+    server = tmdb_stub()
+    checkpoint = tmp_path / "catalog.checkpoint.jsonl"
+    done = {"movie_id": 1, "status": "ok", "details": {"title": "Kept"}}
+    # The torn last line of an interrupted run is skipped and fetched again.
+    checkpoint.write_text(json.dumps(done) + "\n" + '{"movie_id": 2, "sta')
+
+    records, failed = hydrate(
+        [1, 2, 3], str(checkpoint), load=stub_client(server).movie
+    )
+
+    assert failed == 0
+    assert movie_requests(server) == {2: 1, 3: 1}
+    assert records[1]["details"]["title"] == "Kept"
+    assert records[3]["details"]["title"] == "Movie 3"
+    assert set(read_checkpoint(str(checkpoint))) == {1, 2, 3}
+
+
+def test_hydrate_checkpoints_404_as_not_found(tmdb_stub, tmp_path):
+    server = tmdb_stub(not_found=[7])
+    checkpoint = str(tmp_path / "catalog.checkpoint.jsonl")
+    load = stub_client(server).movie
+
+    records, failed = hydrate([7, 8], checkpoint, load=load)
+
+    assert failed == 0
+    assert records[7] == {"movie_id": 7, "status": "not_found"}
+    assert records[8]["status"] == "ok"
+    hydrate([7, 8], checkpoint, load=load)
+    assert movie_requests(server) == {7: 1, 8: 1}
+
+
+def test_hydrate_retries_429_and_5xx(tmdb_stub, tmp_path):
+    server = tmdb_stub(fail_first=2, fail_statuses=(429, 503))
+    checkpoint = str(tmp_path / "catalog.checkpoint.jsonl")
+
+    records, failed = hydrate([4, 5], checkpoint, load=stub_client(server).movie)
+
+    assert failed == 0
+    assert movie_requests(server) == {4: 3, 5: 3}
+    assert {record["status"] for record in records.values()} == {"ok"}
+
+
+def test_hydrate_leaves_failures_for_the_next_run(tmdb_stub, tmp_path):
+    # Five failures outlast one run's three attempts but not two runs'.
+    server = tmdb_stub(fail_first=5)
+    checkpoint = str(tmp_path / "catalog.checkpoint.jsonl")
+    load = stub_client(server).movie
+
+    records, failed = hydrate([9], checkpoint, load=load)
+    assert failed == 1
+    assert records == {}
+    assert read_checkpoint(checkpoint) == {}
+
+    records, failed = hydrate([9], checkpoint, load=load)
+    assert failed == 0
+    assert records[9]["status"] == "ok"
+    assert movie_requests(server) == {9: 6}
@@ -0,0 +1,124 @@
+import threading
+import time
+
+from flask import (
+    Flask,
+    copy_current_request_context,
+    request,
+    stream_with_context,
+)
+
+from cinematch.pagecache import PageCache
+
+
+def slow_page(chunks, delay=0.05, started=None):
+    def render():
+        if started is not None:
+            started.set()
+        for chunk in chunks:
+            time.sleep(delay)
+            yield chunk
+
+    return render
+
+
+def test_unread_stream_still_caches_the_page():
+    # A HEAD request or a client that leaves before the first chunk never
+    # iterates the stream; later requests must not wait on it forever.
+    cache = PageCache(wait_timeout=2)
+    page = cache.stream("key", slow_page(["<a>", "<b>"]))
+    assert not isinstance(page, bytes)
+    del page
+    start = time.perf_counter()
+    assert cache.get("key", lambda: "other") == b"<a><b>"
+    assert time.perf_counter() - start < 1
+    assert cache.stats()["pages"] == 1
+    assert not cache._inflight
+
+
+def test_waiters_read_chunks_while_the_page_renders():
+    cache = PageCache()
+    owner = cache.stream("key", slow_page(["<a>", "<b>", "<c>"], delay=0.2))
+    waiter = cache.stream("key", lambda: ["never"])
+    start = time.perf_counter()
+    assert next(iter(waiter)) == "<a>"
+    assert time.perf_counter() - start < 0.4
+    assert "".join(owner) == "<a><b><c>"
+    assert "".join(waiter) == "<b><c>"
+    assert cache.stats()["coalesced"] == 1
+
+
+def test_waiters_render_themselves_after_the_timeout():
+    cache = PageCache(wait_timeout=0.1)
+    release = threading.Event()
+
+    def stuck():
+        release.wait()
+        yield "late"
+
+    cache.stream("key", stuck)
+    assert cache.get("key", lambda: "fresh") == b"fresh"
+    assert "".join(cache.stream("key", lambda: ["fresh"])) == "fresh"
+    assert cache.stats()["timeouts"] == 2
+    release.set()
+
+
+def test_render_errors_reach_every_reader():
+    cache = PageCache()
+
+    def broken():
+        yield "<a>"
+        raise ValueError("boom")
+
+    page = cache.stream("key", broken)
+    try:
+        "".join(page)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("the error was swallowed")
+    assert cache.stats()["errors"] == 1
+    assert cache.get("key", lambda: "ok") == b"ok"
+
+
+def test_flask_head_does_not_block_later_gets():
+    app = Flask(__name__)
+    cache = PageCache(wait_timeout=2)
+
+    @app.route("/")
+    def page():
+        def render():
+            yield "<p>{}</p>".format(request.path)
+
+        body = cache.stream("home", render, wrap=copy_current_request_context)
+        if isinstance(body, bytes):
+            return body
+        return app.response_class(stream_with_context(body))
+
+    client = app.test_client()
+    assert client.head("/").status_code == 200
+    response = client.get("/")
+    assert response.data == b"<p>/</p>"
+    assert not cache._inflight
+
+
+def test_degraded_renders_expire_quickly():
+    # A render whose cards fell back to local data is kept only long enough
+    # to absorb a burst; the next request renders with the fresh details.
+    cache = PageCache(degraded_ttl=0.1)
+    fallbacks = threading.local()
+
+    def count():
+        return getattr(fallbacks, "n", 0)
+
+    def degraded():
+        fallbacks.n = count() + 1
+        yield "placeholder"
+
+    assert "".join(cache.stream("key", degraded, fallbacks=count)) == "placeholder"
+    assert cache.get("key", lambda: "full", fallbacks=count) == b"placeholder"
+    time.sleep(0.15)
+    assert cache.get("key", lambda: "full", fallbacks=count) == b"full"
+    time.sleep(0.15)
+    assert cache.get("key", lambda: "other", fallbacks=count) == b"full"
+    assert cache.stats()["degraded"] == 1
@@ -0,0 +1,59 @@
+import pytest
+
+pytest.importorskip("PIL")
+
+
+@pytest.fixture
+def app_client(monkeypatch):
+    monkeypatch.setenv("CINEMATCH_WARMER", "0")
+    import flask_app
+
+    return flask_app, flask_app.app.test_client()
+
+
+def use_proxy(monkeypatch, flask_app, server, root):
+    from cinematch.posters import PosterProxy, PosterStore
+
+    proxy = PosterProxy(
+        PosterStore(str(root)),
+        base_url=server.image_url,
+        poster_path=lambda movie_id: "/{}.jpg".format(movie_id),
+    )
+    monkeypatch.setattr(flask_app, "get_poster_proxy", lambda: proxy)
+    return proxy
+
+
+def test_poster_revalidates_with_its_etag(app_client, monkeypatch, tmdb_stub, tmp_path):
+    flask_app, client = app_client
+    server = tmdb_stub()
+    use_proxy(monkeypatch, flask_app, server, tmp_path)
+
+    response = client.get("/poster/11/w185")
+    assert response.status_code == 200
+    assert response.mimetype == "image/jpeg"
+    etag, _ = response.get_etag()
+    assert etag
+
+    response = client.get(
+        "/poster/11/w185", headers={"If-None-Match": '"{}"'.format(etag)}
+    )
+    assert response.status_code == 304
+    assert response.get_etag()[0] == etag
+    assert response.data == b""
+    # The resize came from one download of the source size, and the
+    # revalidation from the local cache.
+    assert server.seen["/t/p/w500/11.jpg"] == 1
+
+
+def test_poster_falls_back_to_the_placeholder(
+    app_client, monkeypatch, tmdb_stub, tmp_path
+):
+    flask_app, client = app_client
+    server = tmdb_stub(fail_first=100)
+    use_proxy(monkeypatch, flask_app, server, tmp_path)
+
+    response = client.get("/poster/12/w342")
+    assert response.status_code == 302
+    assert response.location == flask_app.PLACEHOLDER_POSTER
+    assert response.cache_control.max_age == 300
+    assert server.seen["/t/p/w500/12.jpg"] == 1
@@ -0,0 +1,138 @@
+"""Minimal stand-in for the TMDB movie endpoint and image host, for local runs.
+
+    python tools/tmdb_stub.py --port 8765 --delay 0.05 --not-found 19995
+    TMDB_API_URL=http://127.0.0.1:8765/3 python -m cinematch.catalog Movies
+
+Every /3/movie/<id> request returns deterministic fake details; ids given
+with --not-found answer 404 and ids divisible by --no-poster-every have no
+poster. Each answer takes --delay seconds plus a random --jitter share.
+Posters are served as generated JPEGs from /t/p/<size>/<id>.jpg (point
+TMDB_IMAGE_URL at http://127.0.0.1:8765/t/p); that needs Pillow. With
+--fail-first N, the first N requests for each movie and each image answer
+the --fail-status codes in turn (429 with Retry-After: 0), to exercise the
+client's retries. --port 0 picks a free port and prints it.
+"""
+import argparse
+import functools
+import io
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MOVIE_PATH = re.compile(r"^/3/movie/(\d+)$")
+IMAGE_PATH = re.compile(r"^/t/p/w(\d+)/(\d+)\.jpg$")
+
+
+@functools.lru_cache(maxsize=256)
+def poster_jpeg(width, movie_id):
+    """A noisy 2:3 JPEG tinted by the movie id, so sizes are realistic."""
+    from PIL import Image
+
+    size = (width, width * 3 // 2)
+    tint = Image.new("RGB", size, (movie_id * 37 % 256, movie_id * 91 % 256, 128))
+    noise = Image.effect_noise(size, 48).convert("RGB")
+    out = io.BytesIO()
+    Image.blend(tint, noise, 0.35).save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+
+def make_handler(
+    delay, not_found, no_poster_every, jitter=0.0, fail_first=0, fail_statuses=(503,)
+):
+    requests_seen = Counter()
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            with lock:
+                seen = requests_seen[path]
+                requests_seen[path] += 1
+            if seen < fail_first:
+                status = fail_statuses[seen % len(fail_statuses)]
+                headers = {"Retry-After": "0"} if status == 429 else {}
+                self._send(status, {"success": False}, headers)
+                return
+            image = IMAGE_PATH.match(self.path)
+            if image is not None:
+                self._send_image(int(image.group(1)), int(image.group(2)))
+                return
+            match = MOVIE_PATH.match(path)
+            if match is None or int(match.group(1)) in not_found:
+                self._send(404, {"success": False, "status_code": 34})
+                return
+            movie_id = int(match.group(1))
+            time.sleep(delay + random.uniform(0, jitter))
+            has_poster = not (no_poster_every and movie_id % no_poster_every == 0)
+            self._send(
+                200,
+                {
+                    "id": movie_id,
+                    "title": "Movie {}".format(movie_id),
+                    "overview": "Stub overview for movie {}.".format(movie_id),
+                    "release_date": "{}-01-01".format(1950 + movie_id % 70),
+                    "vote_average": round(movie_id % 100 / 10, 1),
+                    "poster_path": "/{}.jpg".format(movie_id) if has_poster else None,
+                },
+            )
+
+        def _send(self, status, payload, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_image(self, width, movie_id):
+            time.sleep(delay + random.uniform(0, jitter))
+            body = poster_jpeg(width, movie_id)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    Handler.requests_seen = requests_seen
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--not-found", type=int, nargs="*", default=[])
+    parser.add_argument("--no-poster-every", type=int, default=0)
+    parser.add_argument("--fail-first", type=int, default=0)
+    parser.add_argument("--fail-status", type=int, nargs="+", default=[503])
+    args = parser.parse_args()
+
+    handler = make_handler(
+        args.delay,
+        set(args.not_found),
+        args.no_poster_every,
+        args.jitter,
+        args.fail_first,
+        args.fail_status,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    host, port = server.server_address[:2]
+    print("TMDB stub on http://{}:{}/3".format(host, port), flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()